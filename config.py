@@ -57,4 +57,70 @@ FREELANCE_CATEGORIES = {
 }
 
 MAX_PROFILE_PHOTOS = 3
-REQUEST_MESSAGE_LIMIT = 200
\ No newline at end of file
+REQUEST_MESSAGE_LIMIT = 200
+
+# Like notifications: the first like is sent right away, further likes within
+# the window are coalesced into a single digest message.
+LIKE_DIGEST_WINDOW_SECONDS = 15 * 60
+LIKE_DIGEST_FLUSH_INTERVAL = 60 # How often pending digests are checked (seconds)
+
+# Dating browse ranking weights (see ranking.py). Each feature is scaled to 0..1.
+DATING_RANK_WEIGHTS = {
+    'age': 1.0, # Closeness to the viewer's age
+    'distance': 1.5, # Closeness to the viewer's coordinates
+    'freshness': 0.5, # Recently created/updated profiles
+    'photos': 0.3, # More photos
+    'liked_viewer': 2.0, # Candidate already liked the viewer
+}
+RANK_AGE_SCALE_YEARS = 5
+RANK_DISTANCE_SCALE_KM = 50
+RANK_FRESHNESS_SCALE_DAYS = 14
+
+# Retention (see retention.py): resolved/stale rows older than these ages move to archive tables.
+REJECTED_LIKE_RETENTION_DAYS = 30
+PENDING_LIKE_EXPIRY_DAYS = 60 # Unanswered likes are expired after this
+RESOLVED_REPORT_RETENTION_DAYS = 90
+RETENTION_BATCH_SIZE = 500 # Rows moved per transaction
+RETENTION_INTERVAL = 6 * 60 * 60 # Seconds between retention runs
+
+# In-memory browse snapshot (see snapshot.py)
+SNAPSHOT_REFRESH_INTERVAL = 60 # Seconds between incremental refreshes
+SNAPSHOT_FULL_REBUILD_EVERY = 60 # Full rebuild every N refreshes, to drop deleted/banned profiles
+SNAPSHOT_WATERMARK_OVERLAP_SECONDS = 5 # Incremental refreshes re-read this much before the watermark
+
+# Offline geocoding (see geocoding.py). Swap in a larger dataset with the same CSV columns if needed.
+GEOCODER_DATASET = os.getenv("GEOCODER_DATASET", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.csv"))
+GEOCODER_CACHE_DIR = os.getenv("GEOCODER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache"))
+GEOCODER_MAX_REVERSE_KM = 150 # Beyond this, shared coordinates are not snapped to a city
+
+# Job alerts from client projects to matching freelancers (see job_alerts.py)
+JOB_ALERT_DAILY_CAP = 10 # Alerts per freelancer per day; extra ones are held for a next-day digest
+JOB_ALERT_BATCH_SIZE = 20 # Messages per delivery tick (Telegram allows ~30 messages/second overall)
+JOB_ALERT_DIGEST_MAX = 5 # Alerts merged into one digest message; the rest wait for the next tick
+JOB_ALERT_INTERVAL = 1 # Seconds between delivery ticks
+
+# Durable outbound job queue (see outbound_queue.py)
+OUTBOUND_POLL_INTERVAL = 1 # Seconds between worker polls
+OUTBOUND_BATCH_SIZE = 20 # Jobs claimed (and sent concurrently) per poll
+OUTBOUND_MAX_ATTEMPTS = 6 # Then the job is dead-lettered
+OUTBOUND_BACKOFF_BASE = 2 # Seconds; doubles with each failed attempt
+OUTBOUND_BACKOFF_MAX = 10 * 60
+OUTBOUND_STALE_RUNNING_SECONDS = 5 * 60 # 'running' jobs older than this are retried (worker crashed)
+OUTBOUND_DONE_RETENTION_DAYS = 7 # Finished jobs are deleted after this
+
+# Abandoned profile wizard drafts (see draft_expiry.py)
+DRAFT_TIMEOUT_SECONDS = 30 * 60 # Inactivity before a draft is evicted
+DRAFT_WHEEL_TICK_SECONDS = 30 # Timer wheel resolution; also how often the expiry job should run
+DRAFT_WHEEL_SLOTS = 128
+
+# Near-duplicate / spam detection (see spam_detection.py)
+SPAM_MINHASH_PERMUTATIONS = 64
+SPAM_LSH_BANDS = 16 # Must divide SPAM_MINHASH_PERMUTATIONS
+SPAM_SIMILARITY_THRESHOLD = 0.8 # Estimated Jaccard similarity of profile texts
+SPAM_MIN_CLUSTER_SIZE = 3 # Profiles (including the new one) before a report is filed
+
+# Freelancer category pickers and browsing (see handlers/freelancer_browse.py)
+CATEGORY_PICKER_PAGE_SIZE = 6 # Category buttons per picker page
+FREELANCER_BROWSE_PAGE_SIZE = 5 # Freelancers per result page
+FREELANCER_BROWSE_CACHE_SECONDS = 60 # How long a result page is reused before it is re-read
+FREELANCER_BROWSE_CACHE_SIZE = 1000 # Cached pages (and page boundaries) across all users
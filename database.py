@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime, JSON, Float, Boolean
+from sqlalchemy import create_engine, event, case, or_, Column, Integer, String, Text, ForeignKey, DateTime, JSON, Float, Boolean, Index, LargeBinary
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from sqlalchemy.sql import func
+from contextlib import contextmanager
 import datetime
 import logging
 
@@ -22,18 +23,19 @@ class User(Base):
     is_banned = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    dating_profile = relationship("DatingProfile", back_populates="user", uselist=False, cascade="all, delete-orphan")
-    freelancer_profile = relationship("FreelancerProfile", back_populates="user", uselist=False, cascade="all, delete-orphan")
-    client_profile = relationship("ClientProfile", back_populates="user", uselist=False, cascade="all, delete-orphan")
-    sent_likes = relationship("DatingLike", foreign_keys="DatingLike.liker_user_id", back_populates="liker", cascade="all, delete-orphan")
-    received_likes = relationship("DatingLike", foreign_keys="DatingLike.liked_user_id", back_populates="liked", cascade="all, delete-orphan")
-    sent_reports = relationship("Report", foreign_keys="Report.reporter_user_id", back_populates="reporter", cascade="all, delete-orphan")
+    dating_profile = relationship("DatingProfile", back_populates="user", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    freelancer_profile = relationship("FreelancerProfile", back_populates="user", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    client_profile = relationship("ClientProfile", back_populates="user", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    sent_likes = relationship("DatingLike", foreign_keys="DatingLike.liker_user_id", back_populates="liker", cascade="all, delete-orphan", passive_deletes=True)
+    received_likes = relationship("DatingLike", foreign_keys="DatingLike.liked_user_id", back_populates="liked", cascade="all, delete-orphan", passive_deletes=True)
+    sent_reports = relationship("Report", foreign_keys="Report.reporter_user_id", back_populates="reporter", cascade="all, delete-orphan", passive_deletes=True)
     # received_reports relationship might be complex if needed
+    # passive_deletes: related rows are removed by ON DELETE CASCADE instead of being loaded first (see purge_users)
 
 class DatingProfile(Base):
     __tablename__ = 'dating_profiles'
     profile_id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.telegram_id'), unique=True, nullable=False) # One profile per user
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), unique=True, nullable=False) # One profile per user
     unique_bot_id = Column(String, unique=True, nullable=False, default=lambda: generate_unique_id("D"))
     name = Column(String, nullable=False)
     gender = Column(String, nullable=False)
@@ -53,7 +55,7 @@ class DatingProfile(Base):
 class FreelancerProfile(Base):
     __tablename__ = 'freelancer_profiles'
     profile_id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.telegram_id'), unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), unique=True, nullable=False)
     unique_bot_id = Column(String, unique=True, nullable=False, default=lambda: generate_unique_id("F"))
     name = Column(String, nullable=False)
     age = Column(Integer, nullable=True)
@@ -72,7 +74,7 @@ class FreelancerProfile(Base):
 class ClientProfile(Base):
     __tablename__ = 'client_profiles'
     profile_id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.telegram_id'), unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), unique=True, nullable=False)
     unique_bot_id = Column(String, unique=True, nullable=False, default=lambda: generate_unique_id("C"))
     name_company = Column(String, nullable=False)
     country = Column(String, nullable=False)
@@ -86,11 +88,19 @@ class ClientProfile(Base):
 
     user = relationship("User", back_populates="client_profile")
 
+class FreelancerCategoryIndex(Base):
+    """One row per (freelancer, category/sub-category), so matching freelancers is an indexed lookup instead of scanning JSON."""
+    __tablename__ = 'freelancer_category_index'
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    category = Column(String, primary_key=True)
+
+    __table_args__ = (Index('ix_freelancer_category_index_category', 'category', 'user_id'),)
+
 class DatingLike(Base):
     __tablename__ = 'dating_likes'
     like_id = Column(Integer, primary_key=True)
-    liker_user_id = Column(Integer, ForeignKey('users.telegram_id'), nullable=False)
-    liked_user_id = Column(Integer, ForeignKey('users.telegram_id'), nullable=False)
+    liker_user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), nullable=False)
+    liked_user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), nullable=False)
     request_message = Column(Text, nullable=True)
     status = Column(String, default='pending') # pending, accepted, rejected
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
@@ -98,11 +108,32 @@ class DatingLike(Base):
     liker = relationship("User", foreign_keys=[liker_user_id], back_populates="sent_likes")
     liked = relationship("User", foreign_keys=[liked_user_id], back_populates="received_likes")
 
+    __table_args__ = (Index('ix_dating_likes_status_timestamp', 'status', 'timestamp'),) # Used by retention sweeps
+
+
+class DatingInboxEntry(Base):
+    """Materialized pending request, kept in sync with DatingLike so the inbox needs no scan or join."""
+    __tablename__ = 'dating_inbox'
+    like_id = Column(Integer, ForeignKey('dating_likes.like_id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), nullable=False) # Recipient of the like
+    liker_user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), nullable=False)
+    liker_card = Column(JSON, nullable=False) # Display fields of the liker's profile at like time
+
+    __table_args__ = (Index('ix_dating_inbox_user_like', 'user_id', 'like_id'),)
+
+class DatingInboxCounter(Base):
+    __tablename__ = 'dating_inbox_counters'
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    pending_count = Column(Integer, nullable=False, default=0)
+    received_count = Column(Integer, nullable=False, default=0)
+    accepted_count = Column(Integer, nullable=False, default=0)
+    rejected_count = Column(Integer, nullable=False, default=0)
+
 
 class Report(Base):
     __tablename__ = 'reports'
     report_id = Column(Integer, primary_key=True)
-    reporter_user_id = Column(Integer, ForeignKey('users.telegram_id'), nullable=False)
+    reporter_user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), nullable=True) # None for automatic reports
     reported_user_unique_id = Column(String, nullable=True) # Store the unique D_, F_, C_ ID
     report_message = Column(Text, nullable=False)
     status = Column(String, default='new') # new, resolved
@@ -110,10 +141,84 @@ class Report(Base):
 
     reporter = relationship("User", foreign_keys=[reporter_user_id], back_populates="sent_reports")
 
+# --- Spam detection (see spam_detection.py) ---
+
+class ProfileSignature(Base):
+    __tablename__ = 'profile_signatures'
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    profile_type = Column(String, primary_key=True) # dating, freelancer, client
+    minhash = Column(LargeBinary, nullable=False) # uint32 MinHash signature of the profile text
+
+class ProfileSignatureBand(Base):
+    """LSH bands: profiles sharing any band_key are near-duplicate candidates."""
+    __tablename__ = 'profile_signature_bands'
+    band_key = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    profile_type = Column(String, primary_key=True)
+
+class PhotoFingerprint(Base):
+    __tablename__ = 'photo_fingerprints'
+    photo_hash = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.telegram_id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    profile_type = Column(String, primary_key=True)
+
+class OutboundJob(Base):
+    """Durable outbound Telegram work (see outbound_queue.py)."""
+    __tablename__ = 'outbound_jobs'
+    job_id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False) # e.g. send_message, send_photo
+    payload = Column(JSON, nullable=False)
+    idempotency_key = Column(String, unique=True, nullable=True) # Re-enqueueing the same key is a no-op
+    status = Column(String, nullable=False, default='pending') # pending, running, done, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index('ix_outbound_jobs_status_run_at', 'status', 'run_at'),)
+
+# --- Archive (cold) tables, filled by retention.py. No foreign keys so purged users don't block them. ---
+
+# Archive rows get their own key: SQLite hands out a deleted hot row's id again, so source ids can repeat.
+class DatingLikeArchive(Base):
+    __tablename__ = 'dating_likes_archive'
+    archive_id = Column(Integer, primary_key=True)
+    like_id = Column(Integer, nullable=False) # Id in dating_likes at archive time
+    liker_user_id = Column(Integer, nullable=False)
+    liked_user_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False) # rejected, expired
+    timestamp = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index('ix_dating_likes_archive_pair', 'liker_user_id', 'liked_user_id'),) # Rejection lookups in create_like
+
+class ReportArchive(Base):
+    __tablename__ = 'reports_archive'
+    archive_id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, nullable=False) # Id in reports at archive time
+    reporter_user_id = Column(Integer, nullable=True)
+    reported_user_unique_id = Column(String, nullable=True)
+    report_message = Column(Text, nullable=False)
+    status = Column(String, nullable=False)
+    timestamp = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 # --- Database Setup ---
 engine = create_engine(DATABASE_URL) #, echo=True) # Add echo=True for debugging SQL
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+if engine.dialect.name == 'sqlite':
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # Only takes effect on a fresh database (or after a full VACUUM, see retention.compact_database)
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA foreign_keys=ON") # SQLite ignores ON DELETE CASCADE without this
+        cursor.close()
+
+# expire_on_commit=False: objects stay readable after the unit of work commits, without reloading
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 def init_db():
     """Creates database tables."""
@@ -130,6 +235,24 @@ def get_db():
     finally:
         db.close()
 
+@contextmanager
+def unit_of_work(session_factory=SessionLocal):
+    """One session and one transaction per update.
+
+    The CRUD helpers below only add/flush; everything a handler does inside
+    `with unit_of_work() as db:` is committed once on exit (or rolled back on
+    error), so a button press costs a single COMMIT/fsync.
+    """
+    db = session_factory()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 def get_or_create_user(db, user_data: dict):
     """Gets user by telegram_id or creates a new one."""
     user = db.query(User).filter(User.telegram_id == user_data['id']).first()
@@ -141,8 +264,7 @@ def get_or_create_user(db, user_data: dict):
             last_name=user_data.get('last_name')
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        db.flush() # Rows with no ORM relationship to User (indexes, counters) must be inserted after it
         logger.info(f"Created new user: {user.telegram_id}")
     elif user.is_banned: # Check if banned on retrieval
         return None # Don't return banned users
@@ -158,8 +280,7 @@ def get_or_create_user(db, user_data: dict):
              user.last_name = user_data.get('last_name')
              updated = True
         if updated:
-            db.commit()
-            db.refresh(user)
+            logger.info(f"Updated user details: {user.telegram_id}")
     return user
 
 def get_dating_profile(db, user_id):
@@ -180,32 +301,243 @@ def save_dating_profile(db, user_id, profile_data):
     else: # Create new
         profile = DatingProfile(user_id=user_id, **profile_data)
         db.add(profile)
-    db.commit()
-    db.refresh(profile)
     logger.info(f"Saved/Updated Dating Profile for user {user_id}")
     return profile
 
-# --- Add similar save/update functions for FreelancerProfile, ClientProfile ---
-# --- Add functions for creating Likes, Reports, fetching profiles for browsing, etc. ---
+def save_freelancer_profile(db, user_id, profile_data):
+    profile = get_freelancer_profile(db, user_id)
+    if profile: # Update existing
+        for key, value in profile_data.items():
+            setattr(profile, key, value)
+        profile.updated_at = datetime.datetime.now(datetime.timezone.utc)
+    else: # Create new
+        profile = FreelancerProfile(user_id=user_id, **profile_data)
+        db.add(profile)
+    # Keep the category index in step with the JSON list
+    db.query(FreelancerCategoryIndex).filter(FreelancerCategoryIndex.user_id == user_id).delete(synchronize_session=False)
+    db.add_all(FreelancerCategoryIndex(user_id=user_id, category=c) for c in set(profile.categories or []))
+    logger.info(f"Saved/Updated Freelancer Profile for user {user_id}")
+    return profile
+
+def save_client_profile(db, user_id, profile_data):
+    profile = get_client_profile(db, user_id)
+    if profile: # Update existing
+        for key, value in profile_data.items():
+            setattr(profile, key, value)
+        profile.updated_at = datetime.datetime.now(datetime.timezone.utc)
+    else: # Create new
+        profile = ClientProfile(user_id=user_id, **profile_data)
+        db.add(profile)
+    db.flush() # Assigns profile_id, used to queue job alerts
+    logger.info(f"Saved/Updated Client Profile for user {user_id}")
+    return profile
+
+def get_freelancer_ids_for_categories(db, categories, exclude_user_id=None):
+    """Distinct freelancers with any of `categories`, via the category index."""
+    query = (db.query(FreelancerCategoryIndex.user_id)
+             .filter(FreelancerCategoryIndex.category.in_(list(categories)))
+             .distinct())
+    if exclude_user_id is not None:
+        query = query.filter(FreelancerCategoryIndex.user_id != exclude_user_id)
+    return [row[0] for row in query]
+
+def get_freelancer_page(db, categories, after_user_id=None, before_user_id=None, limit=5):
+    """Keyset-paginated freelancers with any of `categories`, ordered by user_id.
+
+    Pass `after_user_id` to page forward or `before_user_id` to page back.
+    The ids come from a range read on ix_freelancer_category_index_category,
+    then only that page's profiles are loaded.
+    """
+    query = (db.query(FreelancerCategoryIndex.user_id)
+             .filter(FreelancerCategoryIndex.category.in_(list(categories)))
+             .distinct())
+    if before_user_id is not None:
+        ids = [row[0] for row in query.filter(FreelancerCategoryIndex.user_id < before_user_id)
+               .order_by(FreelancerCategoryIndex.user_id.desc()).limit(limit)][::-1]
+    else:
+        if after_user_id is not None:
+            query = query.filter(FreelancerCategoryIndex.user_id > after_user_id)
+        ids = [row[0] for row in query.order_by(FreelancerCategoryIndex.user_id).limit(limit)]
+    if not ids:
+        return []
+    profiles = {p.user_id: p for p in db.query(FreelancerProfile).filter(FreelancerProfile.user_id.in_(ids))}
+    return [profiles[user_id] for user_id in ids if user_id in profiles]
+
+# --- Add functions for fetching profiles for browsing, etc. ---
+
+def get_dating_profile_by_id(db, profile_id):
+    return db.query(DatingProfile).filter(DatingProfile.profile_id == profile_id).first()
+
+def get_like(db, liker_id, liked_id):
+    return db.query(DatingLike).filter(
+        DatingLike.liker_user_id == liker_id,
+        DatingLike.liked_user_id == liked_id
+    ).first()
+
+def _liker_card(profile):
+    if not profile:
+        return {}
+    return {
+        'name': profile.name, 'age': profile.age, 'gender': profile.gender,
+        'country': profile.country, 'custom_country': profile.custom_country,
+        'bio': profile.bio, 'unique_bot_id': profile.unique_bot_id,
+    }
+
+def _get_inbox_counter(db, user_id):
+    counter = db.get(DatingInboxCounter, user_id)
+    if not counter:
+        counter = DatingInboxCounter(user_id=user_id, pending_count=0, received_count=0,
+                                     accepted_count=0, rejected_count=0)
+        db.add(counter)
+        db.flush() # db.get() only finds flushed rows, so a second call in this unit of work must not add another
+    return counter
+
+def was_rejected(db, liker_id, liked_id):
+    """True if `liked_id` rejected `liker_id` and retention has since moved that like to the archive."""
+    return db.query(DatingLikeArchive.archive_id).filter(
+        DatingLikeArchive.liker_user_id == liker_id,
+        DatingLikeArchive.liked_user_id == liked_id,
+        DatingLikeArchive.status == 'rejected'
+    ).first() is not None
+
+def create_like(db, liker_id, liked_id, request_message=None):
+    """Creates a pending like plus its inbox entry and counter update.
+    Returns (like, created) so repeated taps don't notify twice. An archived
+    rejection also counts as an existing like (returned as (None, False))."""
+    like = get_like(db, liker_id, liked_id)
+    if like:
+        return like, False
+    if was_rejected(db, liker_id, liked_id):
+        return None, False
+    like = DatingLike(liker_user_id=liker_id, liked_user_id=liked_id, request_message=request_message)
+    db.add(like)
+    db.flush() # Assigns like_id for the inbox entry
+    db.add(DatingInboxEntry(
+        like_id=like.like_id, user_id=liked_id, liker_user_id=liker_id,
+        liker_card=_liker_card(get_dating_profile(db, liker_id))
+    ))
+    counter = _get_inbox_counter(db, liked_id)
+    counter.pending_count += 1
+    counter.received_count += 1
+    logger.info(f"User {liker_id} liked user {liked_id}")
+    return like, True
+
+def get_inbox_page(db, user_id, after_like_id=None, before_like_id=None, limit=1):
+    """Keyset-paginated pending requests for a user, oldest first.
+
+    Pass `after_like_id` to page forward or `before_like_id` to page back.
+    Each call is a single range read on ix_dating_inbox_user_like.
+    """
+    query = db.query(DatingInboxEntry).filter(DatingInboxEntry.user_id == user_id)
+    if before_like_id is not None:
+        entries = (query.filter(DatingInboxEntry.like_id < before_like_id)
+                   .order_by(DatingInboxEntry.like_id.desc()).limit(limit).all())
+        return entries[::-1]
+    if after_like_id is not None:
+        query = query.filter(DatingInboxEntry.like_id > after_like_id)
+    return query.order_by(DatingInboxEntry.like_id).limit(limit).all()
+
+def get_pending_request_count(db, user_id):
+    """Badge count for the dating menu (primary key lookup)."""
+    counter = db.get(DatingInboxCounter, user_id)
+    return counter.pending_count if counter else 0
+
+def get_liker_ids(db, liked_id):
+    """Returns the ids of users with a pending like for `liked_id` (used to boost them while ranking).
+    Likes already accepted or rejected don't count."""
+    return {row[0] for row in db.query(DatingLike.liker_user_id).filter(
+        DatingLike.liked_user_id == liked_id, DatingLike.status == 'pending')}
+
+def update_like_status(db, liker_id, liked_id, status):
+    """Sets a pending like to 'accepted' or 'rejected' and removes it from the inbox.
+    Returns None if there was nothing pending."""
+    like = get_like(db, liker_id, liked_id)
+    if not like or like.status != 'pending':
+        return None
+    like.status = status
+    db.query(DatingInboxEntry).filter(DatingInboxEntry.like_id == like.like_id).delete(synchronize_session=False)
+    counter = _get_inbox_counter(db, liked_id)
+    counter.pending_count = max(counter.pending_count - 1, 0)
+    if status == 'accepted':
+        counter.accepted_count += 1
+    else:
+        counter.rejected_count += 1
+    logger.info(f"Like {liker_id} -> {liked_id} marked as {status}")
+    return like
+
+PROFILE_MODELS = {'dating': DatingProfile, 'freelancer': FreelancerProfile, 'client': ClientProfile}
 
 def delete_profile(db, user_id, profile_type):
-    deleted = False
-    if profile_type == 'dating':
-        profile = get_dating_profile(db, user_id)
-        if profile:
-            db.delete(profile)
-            deleted = True
-    elif profile_type == 'freelancer':
-        profile = get_freelancer_profile(db, user_id)
-        if profile:
-            db.delete(profile)
-            deleted = True
-    # Add 'client' if needed
+    model = PROFILE_MODELS.get(profile_type)
+    if not model:
+        return False
+    deleted = db.query(model).filter(model.user_id == user_id).delete(synchronize_session=False) > 0
+    if profile_type == 'freelancer':
+        db.query(FreelancerCategoryIndex).filter(FreelancerCategoryIndex.user_id == user_id).delete(synchronize_session=False)
+    for index_model in (ProfileSignature, ProfileSignatureBand, PhotoFingerprint):
+        db.query(index_model).filter(index_model.user_id == user_id, index_model.profile_type == profile_type) \
+            .delete(synchronize_session=False)
     if deleted:
-        db.commit()
         logger.info(f"Deleted {profile_type} profile for user {user_id}")
     return deleted
 
+def _chunks(ids, size):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def purge_users(db, user_ids, ban=False, chunk_size=500):
+    """Removes users and everything they own with set-based DELETEs, in the caller's transaction.
+
+    Nothing is loaded into the session, so a user with 100k likes costs a
+    handful of indexed statements. Counters of surviving users are corrected
+    for pending likes the purged users had sent. With `ban=True` the users rows
+    are kept (flagged banned) so they can't simply sign up again.
+    Returns the number of users purged.
+    """
+    user_ids = sorted(set(user_ids))
+    for ids in _chunks(user_ids, chunk_size):
+        # Pending likes from purged users disappear from other users' inboxes
+        pending = (db.query(DatingInboxEntry.user_id, func.count())
+                   .filter(DatingInboxEntry.liker_user_id.in_(ids), DatingInboxEntry.user_id.notin_(ids))
+                   .group_by(DatingInboxEntry.user_id).all())
+        for recipient_id, count in pending:
+            db.query(DatingInboxCounter).filter(DatingInboxCounter.user_id == recipient_id).update(
+                {DatingInboxCounter.pending_count: case(
+                    (DatingInboxCounter.pending_count > count, DatingInboxCounter.pending_count - count), else_=0)},
+                synchronize_session=False)
+
+        # Explicit deletes also cover databases created before the ON DELETE CASCADE constraints existed
+        db.query(DatingInboxEntry).filter(or_(DatingInboxEntry.user_id.in_(ids), DatingInboxEntry.liker_user_id.in_(ids))) \
+            .delete(synchronize_session=False)
+        db.query(DatingLike).filter(or_(DatingLike.liker_user_id.in_(ids), DatingLike.liked_user_id.in_(ids))) \
+            .delete(synchronize_session=False)
+        for model in (DatingInboxCounter, FreelancerCategoryIndex, ProfileSignature, ProfileSignatureBand,
+                      PhotoFingerprint, DatingProfile, FreelancerProfile, ClientProfile):
+            db.query(model).filter(model.user_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Report).filter(Report.reporter_user_id.in_(ids)).delete(synchronize_session=False)
+        if ban:
+            db.query(User).filter(User.telegram_id.in_(ids)).update({User.is_banned: True}, synchronize_session=False)
+        else:
+            db.query(User).filter(User.telegram_id.in_(ids)).delete(synchronize_session=False)
+
+    logger.info(f"Purged {len(user_ids)} users{' (banned)' if ban else ''}.")
+    return len(user_ids)
+
+def enqueue_job(db, kind, payload, idempotency_key=None, delay=0):
+    """Adds an outbound job. Returns the existing job if `idempotency_key` was already used."""
+    if idempotency_key:
+        job = db.query(OutboundJob).filter(OutboundJob.idempotency_key == idempotency_key).first()
+        if job:
+            return job
+    now = datetime.datetime.now(datetime.timezone.utc)
+    job = OutboundJob(
+        kind=kind, payload=payload, idempotency_key=idempotency_key, status='pending', attempts=0,
+        run_at=now + datetime.timedelta(seconds=delay),
+        created_at=now # Sub-second precision for latency metrics (SQLite's server default has whole seconds)
+    )
+    db.add(job)
+    return job
+
 def save_report(db, reporter_id, message, reported_unique_id=None):
     report = Report(
         reporter_user_id=reporter_id,
@@ -213,8 +545,85 @@ def save_report(db, reporter_id, message, reported_unique_id=None):
         reported_user_unique_id=reported_unique_id
     )
     db.add(report)
-    db.commit()
     logger.info(f"Report saved from user {reporter_id}")
     return report
 
-# Add functions for Admin Panel: get_stats, broadcast, manage_user, get_reports
\ No newline at end of file
+def get_reports(db, status='new', prefix=None, limit=20):
+    """Reports for admin triage, newest first. `prefix` filters on the message start (e.g. automatic reports)."""
+    query = db.query(Report).filter(Report.status == status)
+    if prefix:
+        query = query.filter(Report.report_message.startswith(prefix))
+    return query.order_by(Report.report_id.desc()).limit(limit).all()
+
+# Add functions for Admin Panel: get_stats, broadcast, manage_user
+
+
+def _benchmark_wizard_completion():
+    """Counts statements and commits for one dating wizard completion, before and after unit_of_work."""
+    bench_engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=bench_engine)
+    stats = {'statements': 0, 'commits': 0}
+    event.listen(bench_engine, "before_cursor_execute", lambda *args: stats.__setitem__('statements', stats['statements'] + 1))
+    event.listen(bench_engine, "commit", lambda conn: stats.__setitem__('commits', stats['commits'] + 1))
+    profile_data = {'name': 'Asha', 'gender': 'Female', 'age': 25, 'country': 'India', 'photo_file_ids': ['x']}
+
+    def legacy(user_id):
+        # The pre-unit-of-work flow: commit + refresh after each helper, expire_on_commit=True
+        db = sessionmaker(bind=bench_engine)()
+        db.query(User).filter(User.telegram_id == user_id).first()
+        user = User(telegram_id=user_id, first_name='Asha')
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.query(DatingProfile).filter(DatingProfile.user_id == user_id).first()
+        profile = DatingProfile(user_id=user_id, **profile_data)
+        db.add(profile)
+        db.commit()
+        db.refresh(profile)
+        profile.unique_bot_id
+        db.close()
+
+    def current(user_id):
+        with unit_of_work(sessionmaker(autoflush=False, expire_on_commit=False, bind=bench_engine)) as db:
+            get_or_create_user(db, {'id': user_id, 'first_name': 'Asha'})
+            profile = save_dating_profile(db, user_id, profile_data)
+        profile.unique_bot_id
+
+    for label, flow, user_id in (("commit + refresh per helper", legacy, 1), ("unit_of_work", current, 2)):
+        stats.update(statements=0, commits=0)
+        flow(user_id)
+        print(f"{label}: {stats['statements']} statements, {stats['commits']} commits")
+
+def _benchmark_purge(likes=100_000):
+    """Times purging a user with `likes` received likes: ORM cascade vs purge_users."""
+    import time
+    from sqlalchemy import insert
+
+    def setup():
+        bench_engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=bench_engine)
+        factory = sessionmaker(autoflush=False, expire_on_commit=False, bind=bench_engine)
+        with unit_of_work(factory) as db:
+            db.add(User(telegram_id=1, first_name='Popular'))
+            db.execute(insert(DatingLike), [{'liker_user_id': 1000 + i, 'liked_user_id': 1, 'status': 'pending'} for i in range(likes)])
+        return factory
+
+    factory = setup()
+    start = time.perf_counter()
+    with unit_of_work(factory) as db:
+        # The old path: every related row is loaded, then deleted one by one
+        user = db.get(User, 1)
+        for like in list(user.received_likes):
+            db.delete(like)
+        db.delete(user)
+    print(f"ORM cascade delete, {likes} likes: {time.perf_counter() - start:.2f}s")
+
+    factory = setup()
+    start = time.perf_counter()
+    with unit_of_work(factory) as db:
+        purge_users(db, [1])
+    print(f"purge_users, {likes} likes: {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    _benchmark_wizard_completion()
+    _benchmark_purge()
@@ -0,0 +1,160 @@
+import functools
+import itertools
+import logging
+import math
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import ContextTypes, ConversationHandler, TypeHandler
+
+from database import unit_of_work
+from outbound_queue import enqueue_message
+from config import DRAFT_TIMEOUT_SECONDS, DRAFT_WHEEL_TICK_SECONDS, DRAFT_WHEEL_SLOTS
+
+logger = logging.getLogger(__name__)
+
+DRAFT_KEYS = ('profile_data', 'edit_mode', '_user_id_for_timeout') # user_data keys owned by the wizards
+TIMEOUT_TEXT = "Profile creation timed out. Please start again if you wish."
+STATS_SAMPLE_SIZE = 100 # Drafts measured by draft_stats(); memory is extrapolated from them
+
+
+class DraftTimerWheel:
+    """Hashed timer wheel of per-user draft deadlines.
+
+    `touch()` (on every wizard update) and `forget()` are O(1), and each tick
+    only looks at one slot, so cost doesn't grow with the number of idle drafts.
+    Deadlines more than a full turn away simply stay in their slot until the
+    wheel comes round to them again.
+    """
+
+    def __init__(self, timeout=DRAFT_TIMEOUT_SECONDS, tick=DRAFT_WHEEL_TICK_SECONDS, slots=DRAFT_WHEEL_SLOTS):
+        self.tick = tick
+        self.timeout_ticks = max(1, math.ceil(timeout / tick))
+        self._slots = [set() for _ in range(slots)]
+        self._entries = {} # user_id -> (deadline_tick, chat_id)
+        self._current = None # Last tick processed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _tick_at(self, now):
+        return int(now // self.tick)
+
+    def touch(self, user_id, chat_id, now=None):
+        """Pushes the user's deadline to `timeout` from now."""
+        now = time.monotonic() if now is None else now
+        if self._current is None:
+            self._current = self._tick_at(now)
+        self.forget(user_id)
+        deadline = self._tick_at(now) + self.timeout_ticks
+        self._entries[user_id] = (deadline, chat_id)
+        self._slots[deadline % len(self._slots)].add(user_id)
+
+    def forget(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry:
+            self._slots[entry[0] % len(self._slots)].discard(user_id)
+
+    def advance(self, now=None):
+        """Moves the wheel to `now` and returns [(user_id, chat_id)] whose deadline passed."""
+        now = time.monotonic() if now is None else now
+        target = self._tick_at(now)
+        if self._current is None:
+            self._current = target
+            return []
+        expired = []
+        # Visiting more than one full turn of slots would repeat work
+        start = max(self._current + 1, target - len(self._slots) + 1)
+        for tick in range(start, target + 1):
+            slot = self._slots[tick % len(self._slots)]
+            for user_id in [u for u in slot if self._entries[u][0] <= target]:
+                expired.append((user_id, self._entries[user_id][1]))
+                self.forget(user_id)
+        self._current = target
+        return expired
+
+
+draft_wheel = DraftTimerWheel()
+
+
+def _deep_size(obj, seen=None):
+    """Approximate memory of a draft (dicts/lists/strings), in bytes."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_size(v, seen) for v in obj)
+    return size
+
+def draft_stats(application, sample_size=STATS_SAMPLE_SIZE):
+    """Number of live drafts and an estimate of the memory they hold.
+
+    Only up to `sample_size` drafts are measured, so the cost doesn't grow with
+    the number of live drafts.
+    """
+    live = len(draft_wheel)
+    sample = list(itertools.islice(draft_wheel._entries, sample_size))
+    memory = 0
+    for user_id in sample:
+        user_data = application.user_data.get(user_id) or {}
+        memory += sum(_deep_size(user_data[key]) for key in DRAFT_KEYS if key in user_data)
+    return {'live_drafts': live, 'draft_bytes': memory * live // len(sample) if sample else 0}
+
+def discard_draft(user_data, user_id):
+    """Drops a draft when its wizard ends (saved, cancelled or timed out)."""
+    draft_wheel.forget(user_id)
+    for key in DRAFT_KEYS:
+        user_data.pop(key, None)
+
+def requires_draft(step):
+    """Wraps a wizard step so that it ends the conversation if the draft was evicted."""
+    @functools.wraps(step)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        if 'profile_data' in context.user_data:
+            return await step(update, context)
+        logger.info(f"Ending wizard step {step.__name__} for user {update.effective_user.id}: draft expired.")
+        if update.callback_query:
+            await update.callback_query.answer(TIMEOUT_TEXT, show_alert=True)
+        elif update.effective_message:
+            await update.effective_message.reply_text(TIMEOUT_TEXT)
+        return ConversationHandler.END
+    return wrapper
+
+
+async def track_draft_activity(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Refreshes the draft deadline for every update from a user who has a wizard in progress."""
+    if update.effective_user and context.user_data and 'profile_data' in context.user_data:
+        chat_id = update.effective_chat.id if update.effective_chat else update.effective_user.id
+        draft_wheel.touch(update.effective_user.id, chat_id)
+
+async def expire_stale_drafts(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback. Schedule from bot.py with
+    `application.job_queue.run_repeating(expire_stale_drafts, interval=DRAFT_WHEEL_TICK_SECONDS)`."""
+    expired = draft_wheel.advance()
+    if not expired:
+        return
+    notices = []
+    for user_id, chat_id in expired:
+        user_data = context.application.user_data.get(user_id)
+        if not user_data or 'profile_data' not in user_data:
+            continue # Finished or cancelled since the last touch
+        for key in DRAFT_KEYS:
+            user_data.pop(key, None)
+        notices.append(chat_id)
+        # The user is still in the wizard state; their next update hits a requires_draft step, which ends it
+
+    if notices:
+        # One transaction for the whole batch of timeout notices
+        with unit_of_work() as db:
+            for chat_id in notices:
+                enqueue_message(chat_id, TIMEOUT_TEXT, db=db)
+        logger.info(f"Evicted {len(notices)} stale profile drafts, {len(draft_wheel)} still live.")
+
+
+# Register in group -1 so it sees every update before the conversation handlers
+draft_activity_handler = TypeHandler(Update, track_draft_activity)
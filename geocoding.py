@@ -0,0 +1,183 @@
+import bisect
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+from config import GEOCODER_DATASET, GEOCODER_CACHE_DIR, GEOCODER_MAX_REVERSE_KM
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+MIN_PREFIX_LENGTH = 3 # Shorter typed input must match a city name exactly
+
+
+def normalize_city(text):
+    """Casefolds, strips accents/punctuation and collapses spaces: ' São  Paulo!' -> 'sao paulo'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+def _to_unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def _kdtree_order(points):
+    """Orders points as an implicit KD-tree: the middle of every [lo, hi) range splits it on axis depth % 3."""
+    order = np.arange(len(points))
+    stack = [(0, len(points), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi - lo <= 1:
+            continue
+        k = (hi - lo) // 2
+        segment = order[lo:hi]
+        order[lo:hi] = segment[np.argpartition(points[segment, depth % 3], k)]
+        stack.append((lo, lo + k, depth + 1))
+        stack.append((lo + k + 1, hi, depth + 1))
+    return order
+
+
+class OfflineGeocoder:
+    """Reverse and forward city lookup from the bundled dataset, with no network calls.
+
+    The CSV is parsed once into a cache directory: coordinates go to `.npy`
+    files (stored in KD-tree order) that are memory-mapped on load, and names
+    go to a small JSON sidecar holding the sorted, normalized forward index.
+    Nothing is loaded until the first lookup.
+    """
+
+    def __init__(self, dataset=GEOCODER_DATASET, cache_dir=GEOCODER_CACHE_DIR):
+        self.dataset = dataset
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _cache_paths(self):
+        stem = os.path.join(self.cache_dir, os.path.splitext(os.path.basename(self.dataset))[0])
+        return stem + '.points.npy', stem + '.latlon.npy', stem + '.meta.json'
+
+    def _build_cache(self):
+        with open(self.dataset, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        latlon = np.array([(float(r['latitude']), float(r['longitude'])) for r in rows], dtype=np.float64)
+        points = _to_unit_vectors(latlon[:, 0], latlon[:, 1])
+        order = _kdtree_order(points)
+        rows = [rows[i] for i in order]
+
+        index = sorted(
+            (normalize_city(name), i)
+            for i, r in enumerate(rows)
+            for name in [r['name'], *filter(None, (r.get('aliases') or '').split('|'))]
+        )
+        meta = {
+            'names': [r['name'] for r in rows],
+            'countries': [r['country'] for r in rows],
+            'keys': [key for key, _ in index],
+            'ids': [i for _, i in index],
+        }
+
+        points_path, latlon_path, meta_path = self._cache_paths()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(points_path, points[order])
+            np.save(latlon_path, latlon[order])
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Could not write geocoder cache to {self.cache_dir}, keeping it in memory: {e}")
+            return points[order], latlon[order], meta
+        logger.info(f"Built geocoder cache for {len(rows)} cities.")
+        return None
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            points_path, latlon_path, meta_path = self._cache_paths()
+            stale = (not os.path.exists(meta_path)
+                     or os.path.getmtime(meta_path) < os.path.getmtime(self.dataset))
+            in_memory = self._build_cache() if stale else None
+            if in_memory:
+                self._points, self._latlon, meta = in_memory
+            else:
+                self._points = np.load(points_path, mmap_mode='r')
+                self._latlon = np.load(latlon_path, mmap_mode='r')
+                with open(meta_path, encoding='utf-8') as f:
+                    meta = json.load(f)
+            self._names, self._countries = meta['names'], meta['countries']
+            self._keys, self._ids = meta['keys'], meta['ids']
+            self._known_countries = {c.casefold() for c in self._countries}
+            self._loaded = True
+
+    def _result(self, i, **extra):
+        return {
+            'city': self._names[i], 'country': self._countries[i],
+            'latitude': float(self._latlon[i, 0]), 'longitude': float(self._latlon[i, 1]), **extra
+        }
+
+    def reverse(self, latitude, longitude, max_km=GEOCODER_MAX_REVERSE_KM):
+        """Nearest bundled city to the coordinates, or None if it is further than `max_km`."""
+        self._load()
+        query = _to_unit_vectors(latitude, longitude)[0]
+        points = self._points
+        best_i, best_d = -1, np.inf
+        stack = [(0, len(points), 0, 0.0)]
+        while stack:
+            lo, hi, depth, bound = stack.pop()
+            if lo >= hi or bound >= best_d:
+                continue
+            mid = (lo + hi) // 2
+            node = points[mid]
+            d = float(np.sum((node - query) ** 2))
+            if d < best_d:
+                best_i, best_d = mid, d
+            diff = float(query[depth % 3] - node[depth % 3])
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            stack.append((*far, depth + 1, diff * diff)) # Only visited if the split plane is closer than the best match
+            stack.append((*near, depth + 1, 0.0))
+        if best_i < 0:
+            return None
+        distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(min(np.sqrt(best_d) / 2, 1.0))
+        if distance_km > max_km:
+            return None
+        return self._result(best_i, distance_km=round(float(distance_km), 1))
+
+    def forward(self, text, country=None):
+        """Canonical city for a typed name (exact, alias, or unambiguous prefix match), or None.
+
+        If `country` (e.g. the profile's country) is in the dataset, only cities
+        in that country match. An exact name in a country the dataset doesn't
+        know may match any country. A prefix must point to a single city.
+        """
+        self._load()
+        key = normalize_city(text)
+        if not key:
+            return None
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_left(self._keys, key + '\U0010ffff', lo=start) # Whole prefix range
+        wanted = country.casefold() if country else None
+        in_country = lambda i: self._countries[i].casefold() == wanted
+
+        exact = [self._ids[j] for j in range(start, end) if self._keys[j] == key]
+        if wanted:
+            if wanted in self._known_countries:
+                exact = [i for i in exact if in_country(i)]
+            else:
+                exact = [i for i in exact if in_country(i)] or exact
+        if exact:
+            return self._result(exact[0])
+
+        if len(key) < MIN_PREFIX_LENGTH:
+            return None
+        cities = {self._ids[j] for j in range(start, end)} # Aliases of one city count once
+        if wanted:
+            cities = {i for i in cities if in_country(i)}
+        return self._result(cities.pop()) if len(cities) == 1 else None
+
+geocoder = OfflineGeocoder()
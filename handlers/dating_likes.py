@@ -0,0 +1,131 @@
+import logging
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes, CallbackQueryHandler
+
+from database import (
+    unit_of_work, get_dating_profile, get_dating_profile_by_id, create_like,
+    get_inbox_page, get_pending_request_count, update_like_status
+)
+from keyboards import get_like_inbox_keyboard, get_dating_profile_menu_keyboard
+from notifications import like_notifier
+from utils import format_profile_for_display
+
+logger = logging.getLogger(__name__)
+
+
+def _profile_text(profile):
+    profile_dict = {c.name: getattr(profile, c.name) for c in profile.__table__.columns}
+    return format_profile_for_display(profile_dict, profile_type="dating")
+
+# --- Like ---
+async def like_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles 'like_{profile_id}' from the browse keyboard."""
+    query = update.callback_query
+    liker_id = update.effective_user.id
+    profile_id = int(query.data.split('_')[1])
+
+    with unit_of_work() as db:
+        liked_profile = get_dating_profile_by_id(db, profile_id)
+        liker_profile = get_dating_profile(db, liker_id)
+        available = liked_profile and liker_profile and liked_profile.user_id != liker_id
+        if available:
+            liked_id = liked_profile.user_id
+            like, created = create_like(db, liker_id, liked_id)
+            liker_text = _profile_text(liker_profile)
+
+    if not available:
+        await query.answer("This profile is not available.", show_alert=True)
+        return
+    if not created:
+        await query.answer("You have already sent a request to this profile.")
+        return
+
+    await query.answer("❤️ Request sent!")
+    await like_notifier.notify_like(
+        context.bot, liker_id, liked_id,
+        "💌 **Someone liked your profile!**\n\n" + liker_text
+    )
+
+# --- Accept / Reject ---
+async def like_response_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles 'accept_{liker_id}_{liked_id}' and 'reject_{liker_id}_{liked_id}'."""
+    query = update.callback_query
+    action, liker_id, liked_id = query.data.split('_')
+    liker_id, liked_id = int(liker_id), int(liked_id)
+
+    if liked_id != update.effective_user.id:
+        await query.answer("This request is not addressed to you.", show_alert=True)
+        return
+
+    status = 'accepted' if action == 'accept' else 'rejected'
+    with unit_of_work() as db:
+        like = update_like_status(db, liker_id, liked_id, status)
+
+    if not like:
+        await query.answer("This request was already answered.")
+        await query.edit_message_reply_markup(reply_markup=None)
+        return
+
+    await query.answer("Accepted! 🎉" if status == 'accepted' else "Request rejected.")
+    await query.edit_message_reply_markup(reply_markup=None)
+
+    if status == 'accepted':
+        contact = update.effective_user.username
+        contact_text = f"@{contact}" if contact else f"[this user](tg://user?id={liked_id})"
+        try:
+            await context.bot.send_message(
+                chat_id=liker_id,
+                text=f"🎉 Your request was accepted! You can now chat with {contact_text}.",
+                parse_mode='Markdown'
+            )
+        except TelegramError as e:
+            logger.error(f"Failed to notify user {liker_id} about accepted like: {e}")
+
+# --- Requests Inbox ---
+async def like_inbox_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles 'like_inbox_0' (first page), 'like_inbox_n{like_id}' (next) and 'like_inbox_p{like_id}' (prev)."""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    cursor = query.data.split('_')[2]
+    like_notifier.clear(user_id)
+
+    with unit_of_work() as db:
+        # Fetch one extra row in the paging direction to know whether to show that button
+        if cursor.startswith('p'):
+            entries = get_inbox_page(db, user_id, before_like_id=int(cursor[1:]), limit=2)
+            has_prev, has_next = len(entries) > 1, True
+            entries = entries[-1:]
+            if not entries: # Everything before was answered meanwhile, start over
+                entries = get_inbox_page(db, user_id, limit=2)
+                has_prev, has_next = False, len(entries) > 1
+        else:
+            after = int(cursor[1:]) if cursor.startswith('n') else None
+            entries = get_inbox_page(db, user_id, after_like_id=after, limit=2)
+            has_prev, has_next = after is not None, len(entries) > 1
+        pending = get_pending_request_count(db, user_id)
+
+    await query.answer()
+    if not entries:
+        await query.edit_message_text(
+            text="📭 You have no pending requests.",
+            reply_markup=get_dating_profile_menu_keyboard(profile_exists=True, pending_requests=pending)
+        )
+        return
+
+    entry = entries[0]
+    liker_text = format_profile_for_display(entry.liker_card, profile_type="dating") if entry.liker_card else "Profile details unavailable."
+    await query.edit_message_text(
+        text=f"📥 **Pending Requests: {pending}**\n\n" + liker_text,
+        reply_markup=get_like_inbox_keyboard(entry.liker_user_id, user_id, entry.like_id, has_prev, has_next),
+        parse_mode='Markdown'
+    )
+
+
+# --- Handlers Registration ---
+like_handler = CallbackQueryHandler(like_callback, pattern=r'^like_\d+$')
+like_response_handler = CallbackQueryHandler(like_response_callback, pattern=r'^(accept|reject)_\d+_\d+$')
+like_inbox_handler = CallbackQueryHandler(like_inbox_callback, pattern=r'^like_inbox_(0|[np]\d+)$')
+
+# Export handlers to be added in bot.py
+HANDLERS = [like_handler, like_response_handler, like_inbox_handler]
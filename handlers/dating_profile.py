@@ -9,13 +9,17 @@ from telegram.ext import (
     CommandHandler,
 )
 
-from database import get_db, get_or_create_user, save_dating_profile, get_dating_profile, delete_profile
+from database import unit_of_work, get_or_create_user, save_dating_profile, get_dating_profile, delete_profile, get_pending_request_count
 from keyboards import (
     get_gender_keyboard, get_country_keyboard, get_skip_keyboard,
     get_dating_profile_menu_keyboard, get_confirmation_keyboard, get_back_button
 )
-from utils import is_valid_name, is_valid_age, format_profile_for_display, get_file_id_from_message
+from utils import is_valid_name, is_valid_age, format_profile_for_display, get_file_id_from_message, get_file_unique_id_from_message
 from config import MAX_PROFILE_PHOTOS
+from geocoding import geocoder
+from outbound_queue import enqueue_message, enqueue_photo
+from draft_expiry import draft_wheel, discard_draft, requires_draft
+from spam_detection import check_saved_profile
 
 logger = logging.getLogger(__name__)
 
@@ -32,12 +36,14 @@ async def create_dating_profile_start(update: Update, context: ContextTypes.DEFA
     user_id = update.effective_user.id
     context.user_data['profile_data'] = {'photos': []} # Initialize profile data and photos list
     context.user_data['edit_mode'] = False
+    context.user_data['_user_id_for_timeout'] = user_id
+    draft_wheel.touch(user_id, update.effective_chat.id) # Abandoned drafts are evicted by draft_expiry
 
-    db = next(get_db())
-    existing_profile = get_dating_profile(db, user_id)
-    db.close()
+    with unit_of_work() as db:
+        existing_profile = get_dating_profile(db, user_id)
 
     if existing_profile:
+        discard_draft(context.user_data, user_id)
         await query.answer("You already have a dating profile.")
         await query.edit_message_text(
             text="You already have a Dating Profile. What would you like to do?",
@@ -53,6 +59,7 @@ async def create_dating_profile_start(update: Update, context: ContextTypes.DEFA
     )
     return ASK_NAME
 
+@requires_draft
 async def ask_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Stores the name and asks for gender."""
     name = update.message.text.strip()
@@ -70,6 +77,7 @@ async def ask_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     )
     return ASK_GENDER
 
+@requires_draft
 async def ask_gender(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Stores the gender and asks for age."""
     query = update.callback_query
@@ -83,6 +91,7 @@ async def ask_gender(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     )
     return ASK_AGE
 
+@requires_draft
 async def ask_age(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Stores the age and asks for country."""
     age_text = update.message.text.strip()
@@ -100,6 +109,7 @@ async def ask_age(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     )
     return ASK_COUNTRY
 
+@requires_draft
 async def ask_country(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Stores country or asks for custom country name."""
     query = update.callback_query
@@ -125,6 +135,7 @@ async def ask_country(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         )
         return ASK_CUSTOM_COUNTRY
 
+@requires_draft
 async def ask_custom_country(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Stores the custom country name."""
     custom_country = update.message.text.strip()
@@ -142,6 +153,7 @@ async def ask_custom_country(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
     return ASK_BIO
 
+@requires_draft
 async def ask_bio(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Stores the bio (if provided) and asks for location."""
     bio = update.message.text.strip()
@@ -165,6 +177,7 @@ async def ask_bio(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         ]]))
     return ASK_LOCATION
 
+@requires_draft
 async def skip_bio(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Skips the bio step."""
     query = update.callback_query
@@ -182,6 +195,7 @@ async def skip_bio(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         ]]))
     return ASK_LOCATION
 
+@requires_draft
 async def ask_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Stores the location (coordinates or city name) and asks for photos."""
     message = update.message
@@ -191,13 +205,17 @@ async def ask_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     if location:
         context.user_data['profile_data']['latitude'] = location.latitude
         context.user_data['profile_data']['longitude'] = location.longitude
-        # Optional: Reverse geocode to get city name from coordinates (needs external library like geopy)
-        context.user_data['profile_data']['city'] = "Near provided location" # Placeholder
+        # Offline reverse geocode to the nearest known city
+        match = geocoder.reverse(location.latitude, location.longitude)
+        context.user_data['profile_data']['city'] = match['city'] if match else "Near provided location"
         logger.info(f"User {update.effective_user.id} shared coordinates: {location.latitude}, {location.longitude}")
     elif city_name:
-        context.user_data['profile_data']['latitude'] = None
-        context.user_data['profile_data']['longitude'] = None
-        context.user_data['profile_data']['city'] = city_name.strip().title()
+        # Normalize the typed city and give it coordinates so it can take part in distance matching
+        pd = context.user_data['profile_data']
+        match = geocoder.forward(city_name, country=pd.get('custom_country') or pd.get('country'))
+        pd['latitude'] = match['latitude'] if match else None
+        pd['longitude'] = match['longitude'] if match else None
+        pd['city'] = match['city'] if match else city_name.strip().title()
         logger.info(f"User {update.effective_user.id} entered city: {city_name.strip()}")
     else:
         await update.message.reply_text("Invalid input. Please send your location using the button or type your city name.")
@@ -212,6 +230,7 @@ async def ask_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     return ASK_PHOTOS
 
 
+@requires_draft
 async def ask_photos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Collects profile photos."""
     message = update.message
@@ -221,6 +240,8 @@ async def ask_photos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if file_id:
         if len(user_data['profile_data']['photos']) < MAX_PROFILE_PHOTOS:
             user_data['profile_data']['photos'].append(file_id)
+            # file_unique_id is the same for every account sending the photo, unlike file_id (used for reuse detection)
+            user_data['profile_data'].setdefault('photo_unique_ids', []).append(get_file_unique_id_from_message(message))
             remaining = MAX_PROFILE_PHOTOS - len(user_data['profile_data']['photos'])
             logger.info(f"User {update.effective_user.id} added photo {len(user_data['profile_data']['photos'])}/{MAX_PROFILE_PHOTOS}. File ID: {file_id[:10]}...") # Log truncated ID
 
@@ -271,22 +292,16 @@ async def ask_photos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     profile_summary += f"🖼️ Photos: {temp_display_data['photo_count']}\n\n"
     profile_summary += "Do you want to save this profile?"
 
-    # Send preview photo if available
+    # Send preview photo if available. Queued so a slow Bot API call doesn't hold up the handler;
+    # the queue falls back to a text message if the photo can't be sent.
     if pd.get('photos'):
-        try:
-            await context.bot.send_photo(
-                chat_id=update.effective_chat.id,
-                photo=pd['photos'][0], # Send the first photo as preview
-                caption=profile_summary,
-                reply_markup=get_confirmation_keyboard('save_dating_profile', 'cancel_dating_creation')
-            )
-        except Exception as e:
-            logger.error(f"Error sending profile preview photo for user {update.effective_user.id}: {e}")
-            # Fallback to text message if photo fails
-            await update.message.reply_text(
-                profile_summary,
-                reply_markup=get_confirmation_keyboard('save_dating_profile', 'cancel_dating_creation')
-            )
+        enqueue_photo(
+            chat_id=update.effective_chat.id,
+            photo=pd['photos'][0], # Send the first photo as preview
+            caption=profile_summary,
+            reply_markup=get_confirmation_keyboard('save_dating_profile', 'cancel_dating_creation'),
+            idempotency_key=f"dating_preview:{update.update_id}"
+        )
     else: # No photos uploaded
          await update.message.reply_text(
              profile_summary,
@@ -296,6 +311,7 @@ async def ask_photos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return CONFIRM_SAVE
 
 
+@requires_draft
 async def save_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Saves the profile data to the database."""
     query = update.callback_query
@@ -318,14 +334,16 @@ async def save_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     }
 
     try:
-        db = next(get_db())
-        # Ensure user exists before saving profile
-        user = get_or_create_user(db, update.effective_user.to_dict())
-        if not user:
-             raise Exception("User not found or banned.")
-
-        saved_profile = save_dating_profile(db, user_id, db_data)
-        db.close()
+        # User upsert and profile save share one transaction and a single commit
+        with unit_of_work() as db:
+            # Ensure user exists before saving profile
+            user = get_or_create_user(db, update.effective_user.to_dict())
+            if not user:
+                 raise Exception("User not found or banned.")
+
+            saved_profile = save_dating_profile(db, user_id, db_data)
+        # Near-duplicate/spam check, may file an automatic report; runs after the commit so it can't undo the save
+        check_saved_profile(saved_profile, 'dating', profile_data.get('photo_unique_ids'))
         logger.info(f"Dating profile saved successfully for user {user_id}. Unique ID: {saved_profile.unique_bot_id}")
 
         await query.edit_message_text(
@@ -341,8 +359,7 @@ async def save_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
             reply_markup=get_back_button('profile_menu') # Back to profile type choice
         )
 
-    context.user_data.pop('profile_data', None) # Clean up user_data
-    context.user_data.pop('edit_mode', None)
+    discard_draft(context.user_data, user_id) # Clean up user_data
     return ConversationHandler.END
 
 
@@ -351,8 +368,7 @@ async def cancel_creation(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     query = update.callback_query
     await query.answer("Creation cancelled.")
     logger.info(f"User {update.effective_user.id} cancelled dating profile creation.")
-    context.user_data.pop('profile_data', None)
-    context.user_data.pop('edit_mode', None)
+    discard_draft(context.user_data, update.effective_user.id)
     await query.edit_message_text(
         text="Profile creation cancelled. What would you like to do?",
         reply_markup=get_profile_type_choice_keyboard() # Back to profile type choice
@@ -364,22 +380,21 @@ async def timeout_conversation(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = context.user_data.get('_user_id_for_timeout') # Need to store user_id reliably
     if user_id:
          logger.warning(f"Conversation timed out for user {user_id}")
-         context.user_data.pop('profile_data', None)
-         context.user_data.pop('edit_mode', None)
-         try:
-              # Try sending a message if possible
-              await context.bot.send_message(chat_id=user_id, text="Profile creation timed out. Please start again if you wish.")
-         except Exception as e:
-              logger.error(f"Failed to send timeout message to user {user_id}: {e}")
+         discard_draft(context.user_data, user_id)
+         # Queued: retried with backoff and not lost if the bot restarts
+         enqueue_message(
+              chat_id=user_id, text="Profile creation timed out. Please start again if you wish.",
+              idempotency_key=f"dating_timeout:{update.update_id}" if update else None
+         )
     # No return value needed for TIMEOUT state handler
 
 # --- View Profile ---
 async def view_dating_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
      query = update.callback_query
      user_id = update.effective_user.id
-     db = next(get_db())
-     profile = get_dating_profile(db, user_id)
-     db.close()
+     with unit_of_work() as db:
+         profile = get_dating_profile(db, user_id)
+         pending = get_pending_request_count(db, user_id) if profile else 0
 
      if not profile:
          await query.answer("Profile not found.", show_alert=True)
@@ -401,7 +416,7 @@ async def view_dating_profile(update: Update, context: ContextTypes.DEFAULT_TYPE
                  photo=profile.photo_file_ids[0], # Show first photo
                  caption="✨ **Your Dating Profile** ✨\n\n" + profile_text,
                  parse_mode='Markdown',
-                 reply_markup=get_dating_profile_menu_keyboard(profile_exists=True)
+                 reply_markup=get_dating_profile_menu_keyboard(profile_exists=True, pending_requests=pending)
              )
              # Delete the original message with the button after sending the photo
              await query.delete_message()
@@ -411,13 +426,13 @@ async def view_dating_profile(update: Update, context: ContextTypes.DEFAULT_TYPE
               await query.edit_message_text(
                    text="✨ **Your Dating Profile** ✨\n\n" + profile_text,
                    parse_mode='Markdown',
-                   reply_markup=get_dating_profile_menu_keyboard(profile_exists=True)
+                   reply_markup=get_dating_profile_menu_keyboard(profile_exists=True, pending_requests=pending)
               )
      else:
           await query.edit_message_text(
               text="✨ **Your Dating Profile** ✨\n\n" + profile_text,
               parse_mode='Markdown',
-              reply_markup=get_dating_profile_menu_keyboard(profile_exists=True)
+              reply_markup=get_dating_profile_menu_keyboard(profile_exists=True, pending_requests=pending)
           )
 
 # --- Delete Profile ---
@@ -0,0 +1,198 @@
+import logging
+import time
+from collections import OrderedDict
+
+from telegram import Update
+from telegram.ext import ContextTypes, CallbackQueryHandler
+
+from database import unit_of_work, get_freelancer_page
+from keyboards import (
+    CATEGORY_NAMES, SUBCATEGORY_NAMES, get_category_picker_keyboard,
+    get_subcategory_picker_keyboard, get_freelancer_browse_keyboard
+)
+from config import FREELANCER_BROWSE_PAGE_SIZE, FREELANCER_BROWSE_CACHE_SECONDS, FREELANCER_BROWSE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class BrowsePageCache:
+    """Short-lived LRU cache of freelancer result pages.
+
+    Pages are stored under the cursor token that fetched them ('0', 'n{id}' or
+    'p{id}'). Each stored page also records its first/last user_id, so once the
+    page after (or before) it is fetched, the way back is cached too: paging
+    forward and then back again is served from memory without a query.
+    """
+
+    def __init__(self, ttl=FREELANCER_BROWSE_CACHE_SECONDS, max_entries=FREELANCER_BROWSE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, query_key, token):
+        page = self._get((query_key, token))
+        if page is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return page
+
+    def put(self, query_key, token, page):
+        self._set((query_key, token), page)
+        if not page['cards']:
+            return
+        first, last = page['cards'][0]['user_id'], page['cards'][-1]['user_id']
+        self._set((query_key, 'first', first), page)
+        self._set((query_key, 'last', last), page)
+        # Link the neighbour this page was reached from, keyed by the token its Prev/Next button will send
+        if token.startswith('n'):
+            previous = self._get((query_key, 'last', int(token[1:])))
+            if previous:
+                self._set((query_key, f'p{first}'), {**previous, 'has_next': True})
+        elif token.startswith('p'):
+            following = self._get((query_key, 'first', int(token[1:])))
+            if following:
+                self._set((query_key, f'n{last}'), {**following, 'has_prev': True})
+
+
+page_cache = BrowsePageCache()
+
+
+def _category_filter(category_index, sub_index):
+    """The category index values to match: one sub-category, or a main category and all its sub-categories."""
+    if sub_index == 'a':
+        return (CATEGORY_NAMES[category_index],) + SUBCATEGORY_NAMES[category_index]
+    return (SUBCATEGORY_NAMES[category_index][int(sub_index)],)
+
+def _freelancer_card(profile):
+    return {
+        'user_id': profile.user_id,
+        'name': profile.name,
+        'country': profile.custom_country or profile.country,
+        'experience': profile.experience,
+        'rate': profile.rate,
+        'categories': list(profile.categories or []),
+        'unique_bot_id': profile.unique_bot_id,
+    }
+
+def _format_card(card):
+    text = f"👤 **{card['name']}** ({card['country']})\n"
+    if card['experience']:
+        text += f"🎓 Experience: {card['experience']}\n"
+    if card['rate']:
+        text += f"💰 Rate: {card['rate']}\n"
+    categories = card['categories']
+    if categories:
+        text += f"🏷️ {', '.join(categories[:3])}{' …' if len(categories) > 3 else ''}\n"
+    text += f"🆔 `{card['unique_bot_id']}`"
+    return text
+
+def _load_page(category_index, sub_index, token):
+    """Reads one page for the cursor token, fetching one extra row in the paging direction to know whether to show that button."""
+    categories = _category_filter(category_index, sub_index)
+    limit = FREELANCER_BROWSE_PAGE_SIZE + 1
+    with unit_of_work() as db:
+        if token.startswith('p'):
+            profiles = get_freelancer_page(db, categories, before_user_id=int(token[1:]), limit=limit)
+            has_prev, has_next = len(profiles) == limit, True
+            profiles = profiles[-FREELANCER_BROWSE_PAGE_SIZE:]
+        else:
+            after = int(token[1:]) if token.startswith('n') else None
+            profiles = get_freelancer_page(db, categories, after_user_id=after, limit=limit)
+            has_prev, has_next = after is not None, len(profiles) == limit
+            profiles = profiles[:FREELANCER_BROWSE_PAGE_SIZE]
+        cards = [_freelancer_card(p) for p in profiles]
+    return {'cards': cards, 'has_prev': has_prev, 'has_next': has_next}
+
+
+# --- Category pickers ---
+async def category_picker_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles 'fbrowse_cats_{page}'."""
+    query = update.callback_query
+    page = int(query.data.split('_')[2])
+    await query.answer()
+    await query.edit_message_text(
+        text="🔎 **Browse Freelancers**\n\nChoose a category:",
+        reply_markup=get_category_picker_keyboard(page),
+        parse_mode='Markdown'
+    )
+
+async def subcategory_picker_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles 'fbrowse_subs_{category_index}_{page}'."""
+    query = update.callback_query
+    _, _, category_index, page = query.data.split('_')
+    category_index = int(category_index)
+    if category_index >= len(CATEGORY_NAMES):
+        await query.answer("This category is no longer available.", show_alert=True)
+        return
+    await query.answer()
+    await query.edit_message_text(
+        text=f"🔎 **{CATEGORY_NAMES[category_index]}**\n\nChoose a sub-category:",
+        reply_markup=get_subcategory_picker_keyboard(category_index, int(page)),
+        parse_mode='Markdown'
+    )
+
+# --- Results ---
+async def freelancer_list_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles 'fbrowse_list_{category_index}_{sub_index|a}_{0|n{user_id}|p{user_id}}'."""
+    query = update.callback_query
+    _, _, category_index, sub_index, token = query.data.split('_')
+    category_index = int(category_index)
+    if category_index >= len(CATEGORY_NAMES) or (sub_index != 'a' and int(sub_index) >= len(SUBCATEGORY_NAMES[category_index])):
+        await query.answer("This category is no longer available.", show_alert=True)
+        return
+
+    query_key = (category_index, sub_index)
+    page = page_cache.get(query_key, token)
+    if page is None:
+        page = _load_page(category_index, sub_index, token)
+        if not page['cards'] and token.startswith('p'): # Everything before was removed meanwhile, start over
+            token = '0'
+            page = _load_page(category_index, sub_index, token)
+        page_cache.put(query_key, token, page)
+
+    title = CATEGORY_NAMES[category_index] if sub_index == 'a' else SUBCATEGORY_NAMES[category_index][int(sub_index)]
+    await query.answer()
+    cards = page['cards']
+    if not cards:
+        await query.edit_message_text(
+            text=f"🔎 **{title}**\n\nNo freelancers found in this category yet.",
+            reply_markup=get_subcategory_picker_keyboard(category_index),
+            parse_mode='Markdown'
+        )
+        return
+
+    await query.edit_message_text(
+        text=f"🔎 **{title}**\n\n" + "\n\n".join(_format_card(card) for card in cards),
+        reply_markup=get_freelancer_browse_keyboard(
+            category_index, sub_index, cards[0]['user_id'], cards[-1]['user_id'], page['has_prev'], page['has_next']
+        ),
+        parse_mode='Markdown'
+    )
+
+
+# --- Handlers Registration ---
+category_picker_handler = CallbackQueryHandler(category_picker_callback, pattern=r'^fbrowse_cats_\d+$')
+subcategory_picker_handler = CallbackQueryHandler(subcategory_picker_callback, pattern=r'^fbrowse_subs_\d+_\d+$')
+freelancer_list_handler = CallbackQueryHandler(freelancer_list_callback, pattern=r'^fbrowse_list_\d+_(a|\d+)_(0|[np]\d+)$')
+
+# Export handlers to be added in bot.py
+HANDLERS = [category_picker_handler, subcategory_picker_handler, freelancer_list_handler]
@@ -2,7 +2,7 @@ import logging
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
 
-from database import get_or_create_user, get_db, get_dating_profile, get_freelancer_profile # etc
+from database import get_or_create_user, unit_of_work, get_dating_profile, get_freelancer_profile # etc
 from keyboards import get_main_menu_keyboard, get_profile_type_choice_keyboard, get_dating_profile_menu_keyboard, get_freelancer_role_choice_keyboard # etc
 from config import ADMIN_USER_ID
 
@@ -11,9 +11,8 @@ logger = logging.getLogger(__name__)
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends a welcome message when the /start command is issued."""
     user_data = update.effective_user.to_dict()
-    db_session = next(get_db())
-    user = get_or_create_user(db_session, user_data)
-    db_session.close()
+    with unit_of_work() as db_session:
+        user = get_or_create_user(db_session, user_data)
 
     if not user: # Should not happen unless banned, but check anyway
         await update.message.reply_text("Sorry, you cannot use this bot.")
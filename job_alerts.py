@@ -0,0 +1,244 @@
+import datetime
+import logging
+import time
+from collections import deque, defaultdict
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import ContextTypes
+
+from database import unit_of_work, ClientProfile, get_or_create_user, save_client_profile, get_freelancer_ids_for_categories
+from config import JOB_ALERT_DAILY_CAP, JOB_ALERT_BATCH_SIZE, JOB_ALERT_DIGEST_MAX
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096 # Telegram's limit for one text message
+DIGEST_SEPARATOR = "\n\n➖➖➖\n\n"
+
+
+def format_job_alert(project):
+    categories = ', '.join(project.required_category or [])
+    details = project.project_details if len(project.project_details) <= 300 else project.project_details[:297] + '...'
+    text = f"💼 **New project** in {categories}\n\n📝 {details}\n"
+    if project.budget:
+        text += f"💰 Budget: {project.budget}\n"
+    if project.timeline:
+        text += f"⏳ Timeline: {project.timeline}\n"
+    text += f"\n🆔 Project ID: `{project.unique_bot_id}`"
+    return text
+
+def _digest_header(count):
+    if count == 1:
+        return "💼 **1 new project matches your skills**\n\n"
+    return f"💼 **{count} new projects match your skills**\n\n"
+
+def format_digest(alerts):
+    if len(alerts) == 1:
+        return alerts[0][2]
+    projects = sum(1 for a in alerts if a[1] is not None) # "N more projects" lines aren't projects themselves
+    return _digest_header(projects) + DIGEST_SEPARATOR.join(a[2] for a in alerts)
+
+def _more_projects_text(count):
+    return f"➕ {count} more new projects matched your skills while you were at your daily alert limit."
+
+
+class JobAlertFanout:
+    """Background fan-out of new client projects to freelancers in the same categories.
+
+    `submit_project()` only records the project id, so the client's save handler
+    returns at once. Each delivery tick resolves submitted projects to matching
+    freelancers (one indexed query each), then sends at most
+    JOB_ALERT_BATCH_SIZE messages. Several alerts for one freelancer in a tick
+    go out as a single digest of at most JOB_ALERT_DIGEST_MAX alerts (and
+    Telegram's message length); the rest wait for the next tick. Every alert
+    counts against JOB_ALERT_DAILY_CAP. Up to JOB_ALERT_DIGEST_MAX alerts past
+    the cap are held until the next day; any further ones are only counted and
+    announced as one "N more projects" line. After a flood-control error, ticks
+    are skipped until Telegram's retry_after has passed.
+
+    Use `save_client_project()` to save a project, so it is always submitted.
+
+    Schedule from bot.py with
+    `application.job_queue.run_repeating(deliver_job_alerts, interval=JOB_ALERT_INTERVAL)`.
+    """
+
+    def __init__(self, daily_cap=JOB_ALERT_DAILY_CAP, batch_size=JOB_ALERT_BATCH_SIZE, digest_max=JOB_ALERT_DIGEST_MAX):
+        self.daily_cap = daily_cap
+        self.batch_size = batch_size
+        self.digest_max = digest_max
+        self._projects = deque() # (client profile_id, submitted_at)
+        self._queue = deque() # (freelancer_id, project_id, text, enqueued_at)
+        self._held = defaultdict(list) # freelancer_id -> alerts over today's cap (at most digest_max)
+        self._held_overflow = defaultdict(int) # freelancer_id -> alerts past the held ones, announced as a count
+        self._sent_today = {} # freelancer_id -> alerts sent on self._day
+        self._day = datetime.date.today()
+        self._paused_until = 0.0 # monotonic time; set from RetryAfter
+        self._progress = {} # project_id -> {'total': n, 'delivered': n, 'failed': n, 'submitted_at': t}
+        self._stats = {'projects': 0, 'alerts_enqueued': 0, 'alerts_delivered': 0, 'messages_sent': 0,
+                       'alerts_held': 0, 'alerts_collapsed': 0, 'failed': 0, 'latency_total': 0.0, 'latency_max': 0.0}
+
+    def submit_project(self, project_id):
+        """Call after the unit of work that saved the ClientProfile has committed."""
+        self._projects.append((project_id, time.monotonic()))
+        self._stats['projects'] += 1
+
+    def _resolve_projects(self):
+        if not self._projects:
+            return
+        with unit_of_work() as db:
+            while self._projects:
+                project_id, submitted_at = self._projects.popleft()
+                project = db.get(ClientProfile, project_id)
+                if not project or not project.required_category:
+                    continue
+                text = format_job_alert(project)
+                freelancer_ids = get_freelancer_ids_for_categories(db, project.required_category, exclude_user_id=project.user_id)
+                if not freelancer_ids:
+                    continue
+                self._queue.extend((fid, project_id, text, submitted_at) for fid in freelancer_ids)
+                self._progress[project_id] = {'total': len(freelancer_ids), 'delivered': 0, 'failed': 0, 'submitted_at': submitted_at}
+                self._stats['alerts_enqueued'] += len(freelancer_ids)
+                logger.info(f"Project {project_id} fanned out to {len(freelancer_ids)} freelancers.")
+
+    def _roll_day(self):
+        today = datetime.date.today()
+        if today != self._day:
+            self._day = today
+            self._sent_today.clear()
+            # Yesterday's held alerts go out first, one digest per freelancer
+            for freelancer_id, alerts in self._held.items():
+                overflow = self._held_overflow.pop(freelancer_id, 0)
+                if overflow:
+                    alerts = alerts + [(freelancer_id, None, _more_projects_text(overflow), alerts[-1][3])]
+                self._queue.extendleft(reversed(alerts))
+            self._held.clear()
+
+    def _hold(self, alert):
+        """Keeps an alert over the daily cap for tomorrow, or just counts it once enough are held."""
+        freelancer_id = alert[0]
+        if len(self._held[freelancer_id]) < self.digest_max:
+            self._held[freelancer_id].append(alert)
+            self._stats['alerts_held'] += 1
+            return
+        self._held_overflow[freelancer_id] += 1
+        self._stats['alerts_collapsed'] += 1
+        self._record_outcome([alert], delivered=False)
+
+    def _take_batch(self):
+        """Pops queued alerts grouped per freelancer.
+
+        Alerts over the freelancer's daily cap are held, and alerts that don't
+        fit in this tick's digest go back to the front of the queue.
+        """
+        batch = {}
+        lengths = {} # freelancer_id -> digest length so far
+        deferred = []
+        scanned = 0
+        # Bounded scan, so one freelancer with a long backlog can't make a tick walk the whole queue
+        while self._queue and len(batch) < self.batch_size and scanned < self.batch_size * self.digest_max:
+            alert = self._queue.popleft()
+            scanned += 1
+            freelancer_id = alert[0]
+            alerts = batch.get(freelancer_id, [])
+            # "N more projects" lines (project_id None) are never held again
+            if alert[1] is not None and self._sent_today.get(freelancer_id, 0) + len(alerts) >= self.daily_cap:
+                self._hold(alert)
+                continue
+            if alerts:
+                length = lengths[freelancer_id] + len(DIGEST_SEPARATOR) + len(alert[2])
+                if len(alerts) >= self.digest_max or len(_digest_header(len(alerts) + 1)) + length > MAX_MESSAGE_LENGTH:
+                    deferred.append(alert)
+                    continue
+            else:
+                length = len(alert[2])
+            batch.setdefault(freelancer_id, []).append(alert)
+            lengths[freelancer_id] = length
+        self._queue.extendleft(reversed(deferred))
+        return batch
+
+    async def deliver(self, bot):
+        """One delivery tick. Returns the number of messages sent."""
+        self._roll_day()
+        self._resolve_projects()
+        if time.monotonic() < self._paused_until:
+            return 0
+        batch = self._take_batch()
+        sent = 0
+        for freelancer_id, alerts in batch.items():
+            text = format_digest(alerts)
+            try:
+                await bot.send_message(chat_id=freelancer_id, text=text, parse_mode='Markdown')
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if isinstance(e.retry_after, datetime.timedelta) else e.retry_after
+                logger.warning(f"Flood limit hit during job alert delivery, pausing for {retry_after}s.")
+                self._paused_until = time.monotonic() + retry_after
+                self._requeue_rest(batch, freelancer_id)
+                break
+            except TelegramError as e:
+                logger.error(f"Failed to send job alert to user {freelancer_id}: {e}")
+                self._stats['failed'] += len(alerts)
+                self._record_outcome(alerts, delivered=False)
+                continue
+            sent += 1
+            self._sent_today[freelancer_id] = self._sent_today.get(freelancer_id, 0) + len(alerts)
+            self._record_outcome(alerts, delivered=True)
+        self._stats['messages_sent'] += sent
+        return sent
+
+    def _requeue_rest(self, batch, from_freelancer_id):
+        """Puts the alerts of `from_freelancer_id` and everyone after it back at the front of the queue."""
+        ids = list(batch)
+        rest = [a for fid in ids[ids.index(from_freelancer_id):] for a in batch[fid]]
+        self._queue.extendleft(reversed(rest))
+
+    def _record_outcome(self, alerts, delivered):
+        """Updates counters and project progress; a project is finished once every alert was delivered or given up on."""
+        now = time.monotonic()
+        for _, project_id, _, enqueued_at in alerts:
+            latency = now - enqueued_at
+            if delivered:
+                self._stats['alerts_delivered'] += 1
+                self._stats['latency_total'] += latency
+                self._stats['latency_max'] = max(self._stats['latency_max'], latency)
+            progress = self._progress.get(project_id)
+            if progress:
+                progress['delivered' if delivered else 'failed'] += 1
+                if progress['delivered'] + progress['failed'] >= progress['total']:
+                    logger.info(f"Project {project_id} alerts finished in {latency:.1f}s: "
+                                f"{progress['delivered']}/{progress['total']} delivered, {progress['failed']} failed or collapsed.")
+                    del self._progress[project_id]
+
+    def stats(self):
+        """Counters plus queue depth, in-flight project progress and average/max delivery latency (seconds)."""
+        delivered = self._stats['alerts_delivered']
+        return {
+            **{k: v for k, v in self._stats.items() if k != 'latency_total'},
+            'latency_avg': self._stats['latency_total'] / delivered if delivered else 0.0,
+            'queued': len(self._queue),
+            'held': sum(len(a) for a in self._held.values()) + sum(self._held_overflow.values()),
+            'paused_for': max(0.0, self._paused_until - time.monotonic()),
+            'in_progress': {pid: (p['delivered'], p['failed'], p['total']) for pid, p in self._progress.items()},
+        }
+
+
+job_alert_fanout = JobAlertFanout()
+
+
+def save_client_project(user_data, profile_data):
+    """Saves a client's project and, once it has committed, submits it for job alerts.
+
+    Client handlers should save through this rather than calling
+    save_client_profile() directly, so no project misses its fan-out. Returns
+    the saved ClientProfile, or None if the user is banned.
+    """
+    with unit_of_work() as db:
+        user = get_or_create_user(db, user_data)
+        if not user:
+            return None
+        profile = save_client_profile(db, user.telegram_id, profile_data)
+    job_alert_fanout.submit_project(profile.profile_id)
+    return profile
+
+
+async def deliver_job_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback that runs one job alert delivery tick."""
+    await job_alert_fanout.deliver(context.bot)
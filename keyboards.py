@@ -1,5 +1,7 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from config import FREELANCE_CATEGORIES, CATEGORY_PICKER_PAGE_SIZE
+
 # --- Main Menu ---
 def get_main_menu_keyboard():
     keyboard = [
@@ -38,11 +40,13 @@ def get_country_keyboard():
 def get_skip_keyboard(callback_data='skip_step'):
      return InlineKeyboardMarkup([[InlineKeyboardButton("➡️ Skip this step", callback_data=callback_data)]])
 
-def get_dating_profile_menu_keyboard(profile_exists=True):
+def get_dating_profile_menu_keyboard(profile_exists=True, pending_requests=0):
     keyboard = []
     if profile_exists:
+        requests_label = f"📥 My Requests ({pending_requests})" if pending_requests else "📥 My Requests"
         keyboard.extend([
             [InlineKeyboardButton("👤 My Dating Profile", callback_data='view_dating_profile')],
+            [InlineKeyboardButton(requests_label, callback_data='like_inbox_0')],
             [InlineKeyboardButton("✏️ Edit Dating Profile", callback_data='edit_dating_profile_start')],
             [InlineKeyboardButton("💖 Browse Profiles", callback_data='browse_dating_start')],
             [InlineKeyboardButton("🗑️ Delete Dating Profile", callback_data='delete_dating_profile_confirm')],
@@ -89,18 +93,105 @@ def get_like_accept_reject_keyboard(liker_id, liked_id):
     ]
      return InlineKeyboardMarkup(keyboard)
 
+def get_like_digest_keyboard():
+    return InlineKeyboardMarkup([[InlineKeyboardButton("📥 Open Requests", callback_data='like_inbox_0')]])
+
+def get_like_inbox_keyboard(liker_id, liked_id, like_id, has_prev, has_next):
+    # Paging carries the current like_id as a keyset cursor ('n' = forward, 'p' = back)
+    keyboard = [
+        [
+            InlineKeyboardButton("✅ Accept Request", callback_data=f'accept_{liker_id}_{liked_id}'),
+            InlineKeyboardButton("❌ Reject Request", callback_data=f'reject_{liker_id}_{liked_id}'),
+        ]
+    ]
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f'like_inbox_p{like_id}'))
+    if has_next:
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f'like_inbox_n{like_id}'))
+    if nav:
+        keyboard.append(nav)
+    keyboard.append([InlineKeyboardButton("🔙 Back to Menu", callback_data='dating_profile_menu')])
+    return InlineKeyboardMarkup(keyboard)
+
 
 # --- Freelancer ---
 def get_freelancer_role_choice_keyboard():
      keyboard = [
         [InlineKeyboardButton("🛠️ I Want to Work (Freelancer)", callback_data='create_freelancer_profile_start')],
         [InlineKeyboardButton("💰 I Want to Hire (Client)", callback_data='create_client_profile_start')],
+        [InlineKeyboardButton("🔎 Browse Freelancers", callback_data='fbrowse_cats_0')],
         [InlineKeyboardButton("🔙 Back", callback_data='profile_menu')],
     ]
      return InlineKeyboardMarkup(keyboard)
 
-# --- Add keyboards for Freelancer profile creation steps (categories, experience) ---
-# --- Add keyboards for Freelancer browsing preferences and actions ---
+# --- Freelancer category pickers ---
+# Callback data refers to categories by index (names are too long for Telegram's
+# 64-byte limit), and every picker page is built once at import.
+CATEGORY_NAMES = tuple(FREELANCE_CATEGORIES)
+SUBCATEGORY_NAMES = tuple(tuple(subs) for subs in FREELANCE_CATEGORIES.values())
+
+def _build_picker_pages(labels, item_callback, page_callback, back_callback, per_row=1):
+    """One InlineKeyboardMarkup per page of `labels`, with Prev/Next between pages."""
+    page_count = max(1, -(-len(labels) // CATEGORY_PICKER_PAGE_SIZE))
+    pages = []
+    for page in range(page_count):
+        start = page * CATEGORY_PICKER_PAGE_SIZE
+        buttons = [InlineKeyboardButton(label, callback_data=item_callback(start + i))
+                   for i, label in enumerate(labels[start:start + CATEGORY_PICKER_PAGE_SIZE])]
+        keyboard = [buttons[i:i + per_row] for i in range(0, len(buttons), per_row)]
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=page_callback(page - 1)))
+        if page < page_count - 1:
+            nav.append(InlineKeyboardButton("Next ➡️", callback_data=page_callback(page + 1)))
+        if nav:
+            keyboard.append(nav)
+        keyboard.append([InlineKeyboardButton("🔙 Back", callback_data=back_callback)])
+        pages.append(InlineKeyboardMarkup(keyboard))
+    return pages
+
+_CATEGORY_PICKER = _build_picker_pages(
+    CATEGORY_NAMES,
+    item_callback=lambda ci: f'fbrowse_subs_{ci}_0',
+    page_callback=lambda page: f'fbrowse_cats_{page}',
+    back_callback='freelancer_role_choice',
+)
+_SUBCATEGORY_PICKERS = [
+    _build_picker_pages(
+        ("📂 All in this category",) + subs,
+        # Index 0 is "all", sub-categories are shifted by one
+        item_callback=lambda i, ci=ci: f'fbrowse_list_{ci}_{i - 1 if i else "a"}_0',
+        page_callback=lambda page, ci=ci: f'fbrowse_subs_{ci}_{page}',
+        back_callback='fbrowse_cats_0',
+        per_row=2,
+    )
+    for ci, subs in enumerate(SUBCATEGORY_NAMES)
+]
+
+def get_category_picker_keyboard(page=0):
+    return _CATEGORY_PICKER[min(max(page, 0), len(_CATEGORY_PICKER) - 1)]
+
+def get_subcategory_picker_keyboard(category_index, page=0):
+    pages = _SUBCATEGORY_PICKERS[category_index]
+    return pages[min(max(page, 0), len(pages) - 1)]
+
+# --- Freelancer browsing ---
+def get_freelancer_browse_keyboard(category_index, sub_index, first_user_id, last_user_id, has_prev, has_next):
+    # Paging carries the first/last user_id of the page as a keyset cursor ('p' = back, 'n' = forward)
+    prefix = f'fbrowse_list_{category_index}_{sub_index}'
+    keyboard = []
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f'{prefix}_p{first_user_id}'))
+    if has_next:
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f'{prefix}_n{last_user_id}'))
+    if nav:
+        keyboard.append(nav)
+    keyboard.append([InlineKeyboardButton("🗂️ Change Category", callback_data=f'fbrowse_subs_{category_index}_0')])
+    keyboard.append([InlineKeyboardButton("🔙 Back", callback_data='freelancer_role_choice')])
+    return InlineKeyboardMarkup(keyboard)
+
 # --- Add keyboards for Client profile creation steps ---
 
 # --- Common ---
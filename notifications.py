@@ -0,0 +1,99 @@
+import logging
+import time
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import ContextTypes
+
+from keyboards import get_like_accept_reject_keyboard, get_like_digest_keyboard
+from config import LIKE_DIGEST_WINDOW_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class LikeNotifier:
+    """Coalesces like notifications per recipient.
+
+    The first like a user receives is delivered immediately with the
+    accept/reject keyboard. Any further likes inside the digest window are only
+    counted in memory and announced by a single digest message pointing to the
+    requests inbox, so a popular profile costs one send per window instead of
+    one per like. Nothing is lost: the likes themselves live in `dating_likes`
+    and the inbox reads them from there.
+
+    Schedule the flush from bot.py with
+    `application.job_queue.run_repeating(flush_like_digests, interval=LIKE_DIGEST_FLUSH_INTERVAL)`.
+    """
+
+    def __init__(self, window=LIKE_DIGEST_WINDOW_SECONDS):
+        self.window = window
+        self._last_sent = {} # recipient_id -> monotonic time of last outbound message
+        self._pending = {} # recipient_id -> likes received since then
+
+    def pending_count(self, user_id):
+        return self._pending.get(user_id, 0)
+
+    def clear(self, user_id):
+        """Drops the pending count once the user has opened their inbox."""
+        self._pending.pop(user_id, None)
+
+    async def notify_like(self, bot, liker_id, liked_id, text):
+        """Sends `text` right away, or folds the like into the next digest."""
+        now = time.monotonic()
+        last = self._last_sent.get(liked_id)
+        if last is not None and now - last < self.window:
+            self._pending[liked_id] = self._pending.get(liked_id, 0) + 1
+            return False
+
+        try:
+            await bot.send_message(
+                chat_id=liked_id,
+                text=text,
+                reply_markup=get_like_accept_reject_keyboard(liker_id, liked_id),
+                parse_mode='Markdown'
+            )
+        except RetryAfter as e:
+            logger.warning(f"Flood limit hit notifying user {liked_id}, retry after {e.retry_after}s. Deferring to digest.")
+            self._pending[liked_id] = self._pending.get(liked_id, 0) + 1
+        except TelegramError as e:
+            logger.error(f"Failed to send like notification to user {liked_id}: {e}")
+        self._last_sent[liked_id] = now
+        return True
+
+    async def flush(self, bot, force=False):
+        """Sends one digest per recipient whose window has elapsed. Returns the number of messages sent."""
+        now = time.monotonic()
+        sent = 0
+        for user_id, count in list(self._pending.items()):
+            if not force and now - self._last_sent.get(user_id, 0) < self.window:
+                continue
+            try:
+                await bot.send_message(
+                    chat_id=user_id,
+                    text=f"💌 You have {count} new like{'s' if count != 1 else ''} waiting for your answer!",
+                    reply_markup=get_like_digest_keyboard()
+                )
+                sent += 1
+            except RetryAfter as e:
+                logger.warning(f"Flood limit hit during digest flush, retry after {e.retry_after}s.")
+                break # Keep the remaining counts for the next flush
+            except TelegramError as e:
+                logger.error(f"Failed to send like digest to user {user_id}: {e}")
+            self._pending.pop(user_id, None)
+            self._last_sent[user_id] = now
+
+        # Forget quiet recipients so the bookkeeping stays proportional to active users
+        for user_id, last in list(self._last_sent.items()):
+            if now - last >= self.window and user_id not in self._pending:
+                del self._last_sent[user_id]
+
+        if sent:
+            logger.info(f"Flushed {sent} like digests.")
+        return sent
+
+
+like_notifier = LikeNotifier()
+
+
+async def flush_like_digests(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback that flushes pending like digests."""
+    await like_notifier.flush(context.bot)
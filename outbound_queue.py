@@ -0,0 +1,189 @@
+import asyncio
+import datetime
+import logging
+import time
+from collections import deque
+
+from sqlalchemy import func
+from telegram import InlineKeyboardMarkup
+from telegram.error import RetryAfter, BadRequest, Forbidden, TelegramError
+from telegram.ext import ContextTypes
+
+from database import unit_of_work, enqueue_job, OutboundJob
+from config import (
+    OUTBOUND_BATCH_SIZE, OUTBOUND_MAX_ATTEMPTS, OUTBOUND_BACKOFF_BASE, OUTBOUND_BACKOFF_MAX,
+    OUTBOUND_STALE_RUNNING_SECONDS, OUTBOUND_DONE_RETENTION_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {} # kind -> async fn(bot, payload)
+_latencies = deque(maxlen=1000) # Seconds from enqueue to completion of recent jobs
+_counters = {'done': 0, 'retried': 0, 'dead': 0}
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def _naive_utc(value):
+    # SQLite hands timestamps back without tzinfo; everything here is UTC
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+def job_handler(kind):
+    """Registers an async `fn(bot, payload)` for jobs of `kind`."""
+    def decorator(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+def _markup(bot, data):
+    return InlineKeyboardMarkup.de_json(data, bot) if data else None
+
+@job_handler('send_message')
+async def _send_message(bot, payload):
+    await bot.send_message(
+        chat_id=payload['chat_id'], text=payload['text'],
+        reply_markup=_markup(bot, payload.get('reply_markup')), parse_mode=payload.get('parse_mode')
+    )
+
+@job_handler('send_photo')
+async def _send_photo(bot, payload):
+    try:
+        await bot.send_photo(
+            chat_id=payload['chat_id'], photo=payload['photo'], caption=payload.get('caption'),
+            reply_markup=_markup(bot, payload.get('reply_markup')), parse_mode=payload.get('parse_mode')
+        )
+    except BadRequest as e:
+        if not payload.get('fallback_to_text'):
+            raise
+        # e.g. an expired file_id: send the caption as text instead
+        logger.error(f"Error sending photo to {payload['chat_id']}, falling back to text: {e}")
+        await _send_message(bot, {**payload, 'text': payload.get('caption') or ''})
+
+
+# --- Enqueue helpers for handlers ---
+
+def _enqueue(kind, payload, idempotency_key=None, delay=0, db=None):
+    if db is not None:
+        return enqueue_job(db, kind, payload, idempotency_key, delay)
+    with unit_of_work() as db:
+        return enqueue_job(db, kind, payload, idempotency_key, delay)
+
+def enqueue_message(chat_id, text, reply_markup=None, parse_mode=None, idempotency_key=None, db=None):
+    """Queues a text message. Pass `db` to join the caller's unit of work."""
+    payload = {'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode,
+               'reply_markup': reply_markup.to_dict() if reply_markup else None}
+    return _enqueue('send_message', payload, idempotency_key, db=db)
+
+def enqueue_photo(chat_id, photo, caption=None, reply_markup=None, parse_mode=None,
+                  fallback_to_text=True, idempotency_key=None, db=None):
+    """Queues a photo; if Telegram rejects it the caption is sent as text instead."""
+    payload = {'chat_id': chat_id, 'photo': photo, 'caption': caption, 'parse_mode': parse_mode,
+               'reply_markup': reply_markup.to_dict() if reply_markup else None,
+               'fallback_to_text': fallback_to_text}
+    return _enqueue('send_photo', payload, idempotency_key, db=db)
+
+
+# --- Worker ---
+
+def _claim_jobs(limit=OUTBOUND_BATCH_SIZE):
+    """Marks up to `limit` due jobs as running and returns (job_id, kind, payload, attempts, created_at) tuples."""
+    now = _utcnow()
+    with unit_of_work() as db:
+        # Jobs left 'running' by a crashed worker are picked up again
+        stale = now - datetime.timedelta(seconds=OUTBOUND_STALE_RUNNING_SECONDS)
+        db.query(OutboundJob).filter(OutboundJob.status == 'running', OutboundJob.run_at < stale) \
+            .update({OutboundJob.status: 'pending'}, synchronize_session=False)
+
+        jobs = (db.query(OutboundJob)
+                .filter(OutboundJob.status == 'pending', OutboundJob.run_at <= now)
+                .order_by(OutboundJob.run_at)
+                .limit(limit).all())
+        for job in jobs:
+            job.status = 'running'
+            job.run_at = now # Doubles as the claim time for stale detection
+        return [(job.job_id, job.kind, job.payload, job.attempts, job.created_at) for job in jobs]
+
+def _backoff(attempts):
+    return min(OUTBOUND_BACKOFF_BASE * 2 ** attempts, OUTBOUND_BACKOFF_MAX)
+
+async def _run_job(bot, job_id, kind, payload, attempts):
+    """Runs one job. Returns (status, retry_in_seconds, error)."""
+    handler = JOB_HANDLERS.get(kind)
+    if not handler:
+        return 'dead', None, f"No handler for job kind '{kind}'"
+    try:
+        await handler(bot, payload)
+        return 'done', None, None
+    except RetryAfter as e:
+        # Flood control: Telegram says exactly when to come back
+        retry_after = e.retry_after.total_seconds() if isinstance(e.retry_after, datetime.timedelta) else e.retry_after
+        return 'pending', retry_after, str(e)
+    except (Forbidden, BadRequest) as e:
+        return 'dead', None, str(e) # Blocked bot, deleted chat, bad payload: retrying won't help
+    except Exception as e:
+        # Network errors, but also handler bugs or bad payloads: whatever happens, the outcome must be
+        # recorded, or every job claimed with this one stays 'running' and is sent again once stale
+        if not isinstance(e, TelegramError):
+            logger.exception(f"Outbound job {job_id} ({kind}) raised an unexpected error")
+        if attempts + 1 >= OUTBOUND_MAX_ATTEMPTS:
+            return 'dead', None, f"{type(e).__name__}: {e}"
+        return 'pending', _backoff(attempts), f"{type(e).__name__}: {e}"
+
+async def process_outbound_batch(bot):
+    """Claims one batch of due jobs, runs them concurrently and records the outcomes. Returns jobs run."""
+    claimed = _claim_jobs()
+    if not claimed:
+        return 0
+    results = await asyncio.gather(*(_run_job(bot, job_id, kind, payload, attempts)
+                                     for job_id, kind, payload, attempts, _ in claimed))
+
+    now = _utcnow()
+    with unit_of_work() as db:
+        for (job_id, kind, _, attempts, created_at), (status, retry_in, error) in zip(claimed, results):
+            job = db.get(OutboundJob, job_id)
+            job.status = status
+            job.last_error = error
+            if status == 'pending':
+                job.attempts = attempts + 1
+                job.run_at = now + datetime.timedelta(seconds=retry_in)
+                _counters['retried'] += 1
+                logger.warning(f"Outbound job {job_id} ({kind}) failed, retrying in {retry_in}s: {error}")
+            else:
+                job.finished_at = now
+                _counters[status] += 1
+                if status == 'dead':
+                    logger.error(f"Outbound job {job_id} ({kind}) dead-lettered: {error}")
+                elif created_at is not None:
+                    _latencies.append((_naive_utc(now) - _naive_utc(created_at)).total_seconds())
+    return len(claimed)
+
+def delete_finished_jobs(db, days=OUTBOUND_DONE_RETENTION_DAYS):
+    """Drops completed jobs older than `days` (dead letters are kept for inspection)."""
+    cutoff = _utcnow() - datetime.timedelta(days=days)
+    return db.query(OutboundJob).filter(OutboundJob.status == 'done', OutboundJob.finished_at < cutoff) \
+        .delete(synchronize_session=False)
+
+def queue_metrics():
+    """Queue depth per status, oldest due job age, and latency of recently completed jobs (seconds)."""
+    with unit_of_work() as db:
+        depth = dict(db.query(OutboundJob.status, func.count()).group_by(OutboundJob.status).all())
+        oldest_due = (db.query(func.min(OutboundJob.run_at))
+                      .filter(OutboundJob.status == 'pending', OutboundJob.run_at <= _utcnow()).scalar())
+    latencies = sorted(_latencies)
+    return {
+        'depth': depth,
+        'oldest_due_age': (_naive_utc(_utcnow()) - _naive_utc(oldest_due)).total_seconds() if oldest_due else 0.0,
+        'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+        'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        **_counters,
+    }
+
+
+async def process_outbound_jobs(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback. Schedule from bot.py with
+    `application.job_queue.run_repeating(process_outbound_jobs, interval=OUTBOUND_POLL_INTERVAL)`."""
+    started = time.monotonic()
+    count = await process_outbound_batch(context.bot)
+    if count:
+        logger.debug(f"Processed {count} outbound jobs in {time.monotonic() - started:.2f}s")
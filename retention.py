@@ -0,0 +1,160 @@
+import asyncio
+import datetime
+import logging
+from collections import Counter
+
+from sqlalchemy import insert, update, case, or_, and_, text
+from telegram.ext import ContextTypes
+
+from database import (
+    engine, get_db, DatingLike, DatingLikeArchive, DatingInboxEntry, DatingInboxCounter,
+    Report, ReportArchive
+)
+from outbound_queue import delete_finished_jobs
+from config import (
+    REJECTED_LIKE_RETENTION_DAYS, PENDING_LIKE_EXPIRY_DAYS, RESOLVED_REPORT_RETENTION_DAYS,
+    RETENTION_BATCH_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Hot tables that get ANALYZEd after a sweep
+HOT_TABLES = ('dating_likes', 'dating_inbox', 'dating_inbox_counters', 'reports', 'outbound_jobs')
+
+
+def archive_likes(db, now=None, batch_size=RETENTION_BATCH_SIZE):
+    """Moves old rejected likes and expired pending likes to dating_likes_archive.
+
+    Works in batches of `batch_size`, one transaction each, so the bot keeps
+    serving while a large backlog is drained. Expired pending likes are also
+    removed from the materialized inbox and its counters. Returns rows moved.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    rejected_cutoff = now - datetime.timedelta(days=REJECTED_LIKE_RETENTION_DAYS)
+    pending_cutoff = now - datetime.timedelta(days=PENDING_LIKE_EXPIRY_DAYS)
+    moved = 0
+
+    while True:
+        rows = (db.query(DatingLike.like_id, DatingLike.liker_user_id, DatingLike.liked_user_id,
+                         DatingLike.status, DatingLike.timestamp)
+                .filter(or_(
+                    and_(DatingLike.status == 'rejected', DatingLike.timestamp < rejected_cutoff),
+                    and_(DatingLike.status == 'pending', DatingLike.timestamp < pending_cutoff),
+                ))
+                .limit(batch_size).all())
+        if not rows:
+            break
+
+        db.execute(insert(DatingLikeArchive), [
+            {'like_id': r.like_id, 'liker_user_id': r.liker_user_id, 'liked_user_id': r.liked_user_id,
+             'status': 'expired' if r.status == 'pending' else r.status, 'timestamp': r.timestamp}
+            for r in rows
+        ])
+
+        expired_ids = [r.like_id for r in rows if r.status == 'pending']
+        if expired_ids:
+            db.query(DatingInboxEntry).filter(DatingInboxEntry.like_id.in_(expired_ids)).delete(synchronize_session=False)
+            for user_id, count in Counter(r.liked_user_id for r in rows if r.status == 'pending').items():
+                db.execute(
+                    update(DatingInboxCounter)
+                    .where(DatingInboxCounter.user_id == user_id)
+                    .values(pending_count=case(
+                        (DatingInboxCounter.pending_count > count, DatingInboxCounter.pending_count - count),
+                        else_=0
+                    ))
+                )
+
+        db.query(DatingLike).filter(DatingLike.like_id.in_([r.like_id for r in rows])).delete(synchronize_session=False)
+        db.commit()
+        moved += len(rows)
+
+    if moved:
+        logger.info(f"Archived {moved} rejected/expired likes.")
+    return moved
+
+def archive_reports(db, now=None, batch_size=RETENTION_BATCH_SIZE):
+    """Moves resolved reports older than the retention age to reports_archive. Returns rows moved."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    cutoff = now - datetime.timedelta(days=RESOLVED_REPORT_RETENTION_DAYS)
+    moved = 0
+
+    while True:
+        rows = (db.query(Report.report_id, Report.reporter_user_id, Report.reported_user_unique_id,
+                         Report.report_message, Report.status, Report.timestamp)
+                .filter(Report.status == 'resolved', Report.timestamp < cutoff)
+                .limit(batch_size).all())
+        if not rows:
+            break
+        db.execute(insert(ReportArchive), [dict(r._mapping) for r in rows])
+        db.query(Report).filter(Report.report_id.in_([r.report_id for r in rows])).delete(synchronize_session=False)
+        db.commit()
+        moved += len(rows)
+
+    if moved:
+        logger.info(f"Archived {moved} resolved reports.")
+    return moved
+
+def compact_database(pages=1000):
+    """Returns freed pages to the OS and refreshes planner statistics for the hot tables.
+
+    On SQLite this runs `PRAGMA incremental_vacuum`, which frees at most `pages`
+    pages per call so a run never stalls the bot. It does nothing on databases
+    created before auto_vacuum=INCREMENTAL was enabled; convert those once with
+    `python retention.py convert` while the bot is stopped.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == 'sqlite':
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2: # 2 == INCREMENTAL
+                logger.warning("SQLite database is not in auto_vacuum=INCREMENTAL mode; run `python retention.py convert` once while the bot is stopped.")
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(pages)})")
+        for table in HOT_TABLES:
+            conn.execute(text(f"ANALYZE {table}"))
+    logger.info("Database compaction finished.")
+
+def convert_to_incremental_vacuum():
+    """One-time maintenance: switches an existing SQLite database to auto_vacuum=INCREMENTAL.
+
+    Needs a full VACUUM, which locks the whole database, so run it while the bot is stopped.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    # VACUUM can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            logger.info("SQLite database already uses auto_vacuum=INCREMENTAL.")
+            return
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+    logger.info("Converted SQLite database to auto_vacuum=INCREMENTAL.")
+
+def run_retention_sweep():
+    """Archives everything past retention and compacts the database. Returns (likes, reports) moved."""
+    db = next(get_db())
+    try:
+        likes = archive_likes(db)
+        reports = archive_reports(db)
+        jobs = delete_finished_jobs(db)
+        db.commit()
+        if jobs:
+            logger.info(f"Deleted {jobs} finished outbound jobs.")
+    finally:
+        db.close()
+    if likes or reports or jobs:
+        compact_database()
+    return likes, reports
+
+
+async def run_retention(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback. Schedule from bot.py with
+    `application.job_queue.run_repeating(run_retention, interval=RETENTION_INTERVAL)`."""
+    # Runs in a worker thread so batched DB work doesn't block the update loop
+    await asyncio.to_thread(run_retention_sweep)
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ['convert']:
+        convert_to_incremental_vacuum()
+    else:
+        print("Usage: python retention.py convert")
@@ -0,0 +1,246 @@
+import asyncio
+import datetime
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy.sql import func
+from telegram.ext import ContextTypes
+
+from database import get_db, DatingProfile, User
+from config import SNAPSHOT_FULL_REBUILD_EVERY, SNAPSHOT_WATERMARK_OVERLAP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+GENDER_CODES = {'Male': 0, 'Female': 1, 'Other': 2}
+
+
+def _country_key(country, custom_country):
+    return (custom_country or country or '').strip().casefold()
+
+def _set_bits(bitmap, rows, value):
+    """Sets or clears the bits for `rows` in a packed (np.packbits order) bitmap."""
+    if len(rows) == 0:
+        return
+    masks = (0x80 >> (rows & 7)).astype(np.uint8)
+    if value:
+        np.bitwise_or.at(bitmap, rows >> 3, masks)
+    else:
+        np.bitwise_and.at(bitmap, rows >> 3, ~masks)
+
+
+class ProfileSnapshot:
+    """Columnar, array-backed copy of all browsable dating profiles.
+
+    Each profile is one row across parallel NumPy columns (user id, profile id,
+    age, gender code, country code, lat/lon). Gender and country membership is
+    also kept as packed bitmaps (one bit per row), so a browse filter is a few
+    byte-wise ANDs plus an age comparison on the survivors, with no ORM objects.
+
+    `refresh()` only reads rows whose updated_at/created_at moved past the last
+    seen watermark, minus a small overlap: created_at comes from the database
+    clock in whole seconds while updated_at is set from Python with
+    microseconds, and a row can commit a moment after it was stamped. Re-reading
+    the overlap is harmless since applying a row twice is idempotent. Deleted or
+    banned profiles don't touch those timestamps, so a periodic full rebuild
+    (or `remove()`) drops them. All access goes through one lock, since
+    refreshes run in a worker thread while browse reads and `remove()` run on
+    the event loop.
+    """
+
+    def __init__(self):
+        self._n = 0
+        self._capacity = 0
+        self._index = {} # user_id -> row
+        self._watermark = None
+        self._lock = threading.Lock() # Guards every read and write of the columns and bitmaps
+        self._removed = set() # user_ids removed since the last full rebuild started
+        self._country_codes = {} # normalized country name -> code
+        self.user_ids = np.zeros(0, dtype=np.int64)
+        self.profile_ids = np.zeros(0, dtype=np.int64)
+        self.ages = np.zeros(0, dtype=np.uint8)
+        self.genders = np.zeros(0, dtype=np.uint8)
+        self.countries = np.zeros(0, dtype=np.uint16)
+        self.lats = np.zeros(0, dtype=np.float32)
+        self.lons = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=np.uint8)
+        self._gender_bitmaps = [np.zeros(0, dtype=np.uint8) for _ in GENDER_CODES]
+        self._country_bitmaps = []
+
+    def __len__(self):
+        return len(self._index)
+
+    def _grow(self, needed):
+        if needed <= self._capacity:
+            return
+        capacity = max(self._capacity * 2, needed, 1024)
+        capacity += -capacity % 8 # Keep bitmaps byte-aligned
+
+        def grown(arr, size):
+            new = np.zeros(size, dtype=arr.dtype)
+            new[:len(arr)] = arr
+            return new
+
+        for name in ('user_ids', 'profile_ids', 'ages', 'genders', 'countries', 'lats', 'lons'):
+            setattr(self, name, grown(getattr(self, name), capacity))
+        self._alive = grown(self._alive, capacity // 8)
+        self._gender_bitmaps = [grown(b, capacity // 8) for b in self._gender_bitmaps]
+        self._country_bitmaps = [grown(b, capacity // 8) for b in self._country_bitmaps]
+        self._capacity = capacity
+
+    def _country_code(self, key):
+        code = self._country_codes.get(key)
+        if code is None:
+            code = len(self._country_codes)
+            self._country_codes[key] = code
+            self._country_bitmaps.append(np.zeros(self._capacity // 8, dtype=np.uint8))
+        return code
+
+    def refresh(self, db):
+        """Applies profiles changed since the last refresh. Returns the number of rows applied."""
+        changed_at = func.coalesce(DatingProfile.updated_at, DatingProfile.created_at)
+        query = (db.query(DatingProfile.user_id, DatingProfile.profile_id, DatingProfile.age,
+                          DatingProfile.gender, DatingProfile.country, DatingProfile.custom_country,
+                          DatingProfile.latitude, DatingProfile.longitude, changed_at.label('changed_at'))
+                 .join(User, User.telegram_id == DatingProfile.user_id)
+                 .filter(User.is_banned.is_(False)))
+        if self._watermark is not None:
+            query = query.filter(changed_at >= self._watermark - datetime.timedelta(seconds=SNAPSHOT_WATERMARK_OVERLAP_SECONDS))
+        rows = query.all()
+        if not rows:
+            return 0
+        with self._lock: # Readers and remove() run on the event loop while this runs in a worker thread
+            self._grow(self._n + len(rows))
+            idx = np.empty(len(rows), dtype=np.int64)
+            for i, r in enumerate(rows):
+                row = self._index.get(r.user_id)
+                if row is None:
+                    row = self._n
+                    self._index[r.user_id] = row
+                    self._n += 1
+                idx[i] = row
+
+            # Clear the old gender/country bits of updated rows (new rows have none set)
+            for code in np.unique(self.genders[idx]):
+                _set_bits(self._gender_bitmaps[code], idx[self.genders[idx] == code], False)
+            for code in np.unique(self.countries[idx]):
+                if code < len(self._country_bitmaps):
+                    _set_bits(self._country_bitmaps[code], idx[self.countries[idx] == code], False)
+
+            self.user_ids[idx] = [r.user_id for r in rows]
+            self.profile_ids[idx] = [r.profile_id for r in rows]
+            self.ages[idx] = [r.age for r in rows]
+            self.genders[idx] = [GENDER_CODES.get(r.gender, GENDER_CODES['Other']) for r in rows]
+            self.countries[idx] = [self._country_code(_country_key(r.country, r.custom_country)) for r in rows]
+            self.lats[idx] = [np.nan if r.latitude is None else r.latitude for r in rows]
+            self.lons[idx] = [np.nan if r.longitude is None else r.longitude for r in rows]
+
+            for code in np.unique(self.genders[idx]):
+                _set_bits(self._gender_bitmaps[code], idx[self.genders[idx] == code], True)
+            for code in np.unique(self.countries[idx]):
+                _set_bits(self._country_bitmaps[code], idx[self.countries[idx] == code], True)
+            _set_bits(self._alive, idx, True)
+
+            stamps = [r.changed_at for r in rows if r.changed_at is not None]
+            if stamps and (self._watermark is None or max(stamps) > self._watermark):
+                self._watermark = max(stamps)
+        return len(rows)
+
+    def remove(self, user_id):
+        """Hides a profile right away (e.g. after delete or ban) until the next full rebuild."""
+        with self._lock:
+            self._removed.add(user_id)
+            self._remove(user_id)
+
+    def _remove(self, user_id):
+        row = self._index.pop(user_id, None)
+        if row is not None:
+            _set_bits(self._alive, np.array([row]), False)
+
+    def start_rebuild(self):
+        """Call before building the replacement snapshot, so removals made during the build carry over."""
+        with self._lock:
+            self._removed.clear()
+
+    def replace_with(self, other):
+        """Swaps in a freshly built snapshot (used by full rebuilds)."""
+        with self._lock:
+            # The build may have read profiles that were removed while it ran
+            for user_id in self._removed:
+                other._remove(user_id)
+            state = {k: v for k, v in other.__dict__.items() if k not in ('_lock', '_removed')}
+            self.__dict__.update(state)
+
+    def filter(self, gender=None, min_age=None, max_age=None, country=None, custom_country=None, exclude_user_ids=()):
+        """Returns the row numbers of profiles matching the browse filters.
+
+        `gender` is 'Male'/'Female'/'Other' or None for any. Use `user_ids[rows]`
+        or `columns(rows)` to get the matching data.
+        """
+        with self._lock:
+            return self._filter(gender, min_age, max_age, country, custom_country, exclude_user_ids)
+
+    def _filter(self, gender, min_age, max_age, country, custom_country, exclude_user_ids):
+        nbytes = (self._n + 7) // 8
+        bitmap = self._alive[:nbytes].copy()
+        if gender is not None:
+            bitmap &= self._gender_bitmaps[GENDER_CODES[gender]][:nbytes]
+        if country or custom_country:
+            code = self._country_codes.get(_country_key(country, custom_country))
+            if code is None:
+                return np.zeros(0, dtype=np.int64)
+            bitmap &= self._country_bitmaps[code][:nbytes]
+
+        rows = np.flatnonzero(np.unpackbits(bitmap, count=self._n))
+        if min_age is not None or max_age is not None:
+            ages = self.ages[rows]
+            rows = rows[(ages >= (min_age or 0)) & (ages <= (max_age or 255))]
+        if exclude_user_ids:
+            rows = rows[~np.isin(self.user_ids[rows], np.fromiter(exclude_user_ids, dtype=np.int64))]
+        return rows
+
+    def columns(self, rows):
+        """Column slices for `rows`, e.g. to feed ranking.score_arrays."""
+        with self._lock:
+            return {
+                'user_ids': self.user_ids[rows], 'profile_ids': self.profile_ids[rows], 'ages': self.ages[rows],
+                'lats': self.lats[rows].astype(np.float64), 'lons': self.lons[rows].astype(np.float64),
+            }
+
+    def memory_bytes(self):
+        arrays = [self.user_ids, self.profile_ids, self.ages, self.genders, self.countries,
+                  self.lats, self.lons, self._alive, *self._gender_bitmaps, *self._country_bitmaps]
+        return sum(a.nbytes for a in arrays)
+
+
+profile_snapshot = ProfileSnapshot()
+_refresh_runs = 0
+
+
+def _refresh(snapshot):
+    db = next(get_db())
+    try:
+        return snapshot.refresh(db)
+    finally:
+        db.close()
+
+def _build_snapshot():
+    snapshot = ProfileSnapshot()
+    _refresh(snapshot)
+    return snapshot
+
+async def refresh_profile_snapshot(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback. Schedule from bot.py with
+    `application.job_queue.run_repeating(refresh_profile_snapshot, interval=SNAPSHOT_REFRESH_INTERVAL, first=0)`."""
+    global _refresh_runs
+    if _refresh_runs % SNAPSHOT_FULL_REBUILD_EVERY == 0:
+        # Build off the event loop, then swap in one step so readers never see a half-built snapshot
+        profile_snapshot.start_rebuild()
+        profile_snapshot.replace_with(await asyncio.to_thread(_build_snapshot))
+        logger.info(f"Rebuilt profile snapshot: {len(profile_snapshot)} profiles, {profile_snapshot.memory_bytes() // 1024} KiB")
+    else:
+        # Also off the loop; refresh() applies its rows under the snapshot lock
+        applied = await asyncio.to_thread(_refresh, profile_snapshot)
+        if applied:
+            logger.info(f"Profile snapshot refreshed with {applied} changed profiles.")
+    _refresh_runs += 1
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import re
+
+import numpy as np
+
+from database import (
+    unit_of_work, ProfileSignature, ProfileSignatureBand, PhotoFingerprint, Report,
+    DatingProfile, FreelancerProfile, ClientProfile
+)
+from config import (
+    SPAM_MINHASH_PERMUTATIONS, SPAM_LSH_BANDS, SPAM_SIMILARITY_THRESHOLD, SPAM_MIN_CLUSTER_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+AUTO_REPORT_PREFIX = "[auto] "
+SHINGLE_SIZE = 5 # Characters
+MIN_TEXT_LENGTH = 20 # Shorter texts ("hi", "looking for friends") match too easily to be evidence
+
+PROFILE_TEXT_FIELDS = {'dating': 'bio', 'freelancer': 'skills_portfolio', 'client': 'project_details'}
+PROFILE_MODELS = {'dating': DatingProfile, 'freelancer': FreelancerProfile, 'client': ClientProfile}
+
+SIGNATURE_VERSION = 2 # Bump if the hash functions change; band keys carry it, so old signatures never match
+_PRIME = (1 << 31) - 1 # a * x stays below 2**63 for 32-bit shingle hashes
+_ROWS_PER_BAND = SPAM_MINHASH_PERMUTATIONS // SPAM_LSH_BANDS
+
+
+def _coefficient(name, i, low):
+    # Derived from blake2b rather than a NumPy RNG, whose output may change between NumPy versions:
+    # stored signatures must stay comparable across upgrades and restarts
+    digest = hashlib.blake2b(f"minhash-{name}-{i}".encode('ascii'), digest_size=8).digest()
+    return low + int.from_bytes(digest, 'little') % (_PRIME - low)
+
+_A = np.array([_coefficient('a', i, 1) for i in range(SPAM_MINHASH_PERMUTATIONS)], dtype=np.uint64)
+_B = np.array([_coefficient('b', i, 0) for i in range(SPAM_MINHASH_PERMUTATIONS)], dtype=np.uint64)
+
+
+def _normalize(text):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', (text or '').casefold()).split())
+
+def _hash32(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=4).digest(), 'little')
+
+def minhash(text):
+    """MinHash signature (uint32 array) of the text's character shingles, or None if it is too short."""
+    text = _normalize(text)
+    if len(text) < MIN_TEXT_LENGTH:
+        return None
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    x = np.fromiter((_hash32(s) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # One (permutations x shingles) pass: h_i(x) = (a_i * x + b_i) mod p, minimum over shingles
+    return ((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+def band_keys(signature):
+    return [
+        f"v{SIGNATURE_VERSION}:{band}:" + hashlib.blake2b(signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND].tobytes(), digest_size=8).hexdigest()
+        for band in range(SPAM_LSH_BANDS)
+    ]
+
+def photo_hash(file_id):
+    return hashlib.sha1(file_id.encode('utf-8')).hexdigest()
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def check_profile(db, profile, profile_type, photo_unique_ids=None):
+    """Indexes a saved profile and files an automatic Report if it belongs to a spam cluster.
+
+    Candidates come from LSH band lookups and exact photo reuse, so cost doesn't
+    depend on the number of indexed profiles. Photos are fingerprinted by
+    `photo_unique_ids` (Telegram's file_unique_id, which is the same whoever
+    sends the photo) when given, else by file_id. Returns the filed Report, or None.
+    """
+    user_id = profile.user_id
+    text = getattr(profile, PROFILE_TEXT_FIELDS[profile_type])
+    photos = set(photo_unique_ids or getattr(profile, 'photo_file_ids', None) or [])
+    signature = minhash(text)
+
+    # Re-index this profile from scratch
+    for model in (ProfileSignature, ProfileSignatureBand, PhotoFingerprint):
+        db.query(model).filter(model.user_id == user_id, model.profile_type == profile_type).delete(synchronize_session=False)
+
+    text_matches = {}
+    if signature is not None:
+        keys = band_keys(signature)
+        candidates = {row[0] for row in db.query(ProfileSignatureBand.user_id).filter(
+            ProfileSignatureBand.band_key.in_(keys), ProfileSignatureBand.profile_type == profile_type,
+            ProfileSignatureBand.user_id != user_id).distinct()}
+        if candidates:
+            for other in db.query(ProfileSignature).filter(ProfileSignature.profile_type == profile_type,
+                                                           ProfileSignature.user_id.in_(candidates)):
+                score = similarity(signature, np.frombuffer(other.minhash, dtype=np.uint32))
+                if score >= SPAM_SIMILARITY_THRESHOLD:
+                    text_matches[other.user_id] = score
+        db.add(ProfileSignature(user_id=user_id, profile_type=profile_type, minhash=signature.tobytes()))
+        db.add_all(ProfileSignatureBand(band_key=key, user_id=user_id, profile_type=profile_type) for key in keys)
+
+    photo_matches = set()
+    if photos:
+        hashes = [photo_hash(file_id) for file_id in photos]
+        photo_matches = {row[0] for row in db.query(PhotoFingerprint.user_id).filter(
+            PhotoFingerprint.photo_hash.in_(hashes), PhotoFingerprint.profile_type == profile_type,
+            PhotoFingerprint.user_id != user_id)}
+        db.add_all(PhotoFingerprint(photo_hash=h, user_id=user_id, profile_type=profile_type) for h in hashes)
+
+    cluster = set(text_matches) | photo_matches
+    if not photo_matches and len(cluster) + 1 < SPAM_MIN_CLUSTER_SIZE:
+        return None
+    return _file_report(db, profile, profile_type, text_matches, photo_matches)
+
+def check_saved_profile(profile, profile_type, photo_unique_ids=None):
+    """Runs check_profile in its own unit of work, after the profile save has committed.
+
+    A failing check is logged and never rolls back the user's profile.
+    """
+    try:
+        with unit_of_work() as db:
+            return check_profile(db, profile, profile_type, photo_unique_ids)
+    except Exception as e:
+        logger.error(f"Spam check failed for {profile_type} profile of user {profile.user_id}: {e}")
+        return None
+
+def _file_report(db, profile, profile_type, text_matches, photo_matches):
+    already_open = db.query(Report.report_id).filter(
+        Report.reported_user_unique_id == profile.unique_bot_id, Report.status == 'new',
+        Report.report_message.startswith(AUTO_REPORT_PREFIX)).first()
+    if already_open:
+        return None
+
+    model = PROFILE_MODELS[profile_type]
+    others = dict(db.query(model.user_id, model.unique_bot_id).filter(model.user_id.in_(set(text_matches) | photo_matches)).all())
+    lines = [f"{AUTO_REPORT_PREFIX}Possible spam cluster around {profile.unique_bot_id} ({profile_type}):"]
+    for user_id, unique_id in others.items():
+        reasons = []
+        if user_id in text_matches:
+            reasons.append(f"text similarity {text_matches[user_id]:.2f}")
+        if user_id in photo_matches:
+            reasons.append("reused photo")
+        lines.append(f"- {unique_id or user_id}: {', '.join(reasons)}")
+
+    report = Report(reporter_user_id=None, reported_user_unique_id=profile.unique_bot_id, report_message='\n'.join(lines))
+    db.add(report)
+    logger.warning(f"Auto-reported {profile.unique_bot_id}: {len(others)} similar profiles.")
+    return report
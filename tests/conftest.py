@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# The modules read DATABASE_URL and create the engine at import time, so point it at a scratch database first
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,39 @@
+import asyncio
+
+from telegram.error import RetryAfter
+
+from database import init_db, unit_of_work, OutboundJob
+from outbound_queue import enqueue_message, process_outbound_batch
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        if chat_id == 2:
+            raise ValueError("bad payload")
+        if chat_id == 3:
+            raise RetryAfter(5)
+        self.sent.append(chat_id)
+
+
+def test_unexpected_handler_error_does_not_strand_claimed_jobs():
+    init_db()
+    with unit_of_work() as db:
+        db.query(OutboundJob).delete()
+    ids = [enqueue_message(chat_id, "hi").job_id for chat_id in (1, 2, 3)]
+
+    bot = FakeBot()
+    assert asyncio.run(process_outbound_batch(bot)) == 3
+
+    with unit_of_work() as db:
+        jobs = {job.job_id: job for job in db.query(OutboundJob).filter(OutboundJob.job_id.in_(ids))}
+    assert bot.sent == [1]
+    assert [jobs[i].status for i in ids] == ['done', 'pending', 'pending']
+    assert jobs[ids[1]].attempts == 1 and 'ValueError' in jobs[ids[1]].last_error
+    assert jobs[ids[2]].attempts == 1 # RetryAfter result recorded, not lost
+
+    # Nothing is due again right away, so the delivered message is not sent twice
+    assert asyncio.run(process_outbound_batch(bot)) == 0
+    assert bot.sent == [1]
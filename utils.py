@@ -42,4 +42,10 @@ def get_file_id_from_message(message):
     if message.photo:
         return message.photo[-1].file_id
     # Add checks for other media types if needed (documents, video for portfolio?)
+    return None
+
+def get_file_unique_id_from_message(message):
+    """Extracts the file_unique_id of the highest resolution photo (the same for every account that sends it)."""
+    if message.photo:
+        return message.photo[-1].file_unique_id
     return None
\ No newline at end of file